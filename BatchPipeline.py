@@ -0,0 +1,267 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from collections import deque, namedtuple
+from functools import partial
+
+from rdflib import Graph
+
+from DetectionBridge import add_detection_triples
+from InstanceIds import ID_ALLOCATORS
+from Metrics import metrics
+from SceneGraphGenerator import SceneGraphGenerator
+from SceneLog import SceneLog
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+OUTPUT_EXTENSIONS = {"turtle": ".ttl", "nt": ".nt", "xml": ".owl"}
+
+# boxes holds the record's YOLO detections when the pipeline runs with --detect
+SceneRecord = namedtuple("SceneRecord", ["record_id", "image_path", "description", "boxes"], defaults=(None,))
+
+# Generator owned by this process; pool workers share the parent's copy under fork, or load the snapshot under spawn
+_worker_generator = None
+
+
+def iter_directory_records(directory, require_description=True):
+    # Each image is paired with a text file of the same name holding its triples description
+    for file_name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(file_name)
+        if extension.lower() not in IMAGE_EXTENSIONS:
+            continue
+        description_path = os.path.join(directory, stem + ".txt")
+        if os.path.exists(description_path):
+            with open(description_path, encoding="utf-8") as f:
+                description = f.read()
+        elif require_description:
+            print(f"Skipping {file_name}: no {stem}.txt description")
+            continue
+        else:
+            description = ""
+        yield SceneRecord(stem, os.path.join(directory, file_name), description)
+
+
+def iter_manifest_records(manifest_path, require_description=True):
+    # One JSON object per line: {"id": ..., "image": ..., "description": ...} or "description_file" instead
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping manifest line {line_number}: {e}")
+                continue
+            image_path = entry.get("image")
+            if image_path and not os.path.isabs(image_path):
+                image_path = os.path.join(base_dir, image_path)
+            description = entry.get("description")
+            if description is None and "description_file" in entry:
+                description_path = os.path.join(base_dir, entry["description_file"])
+                try:
+                    with open(description_path, encoding="utf-8") as description_file:
+                        description = description_file.read()
+                except OSError as e:
+                    print(f"Skipping manifest line {line_number}: {e}")
+                    continue
+            if description is None:
+                if require_description:
+                    print(f"Skipping manifest line {line_number}: no description")
+                    continue
+                description = ""
+            record_id = entry.get("id") or (os.path.splitext(os.path.basename(image_path))[0] if image_path else f"scene{line_number}")
+            yield SceneRecord(str(record_id), image_path, description)
+
+
+def iter_records(source, require_description=True):
+    if os.path.isdir(source):
+        return iter_directory_records(source, require_description)
+    return iter_manifest_records(source, require_description)
+
+
+def attach_detections(records, engine):
+    # Run the records' images through the detection engine in batches and attach the boxes to each record
+    pending = deque()
+
+    def image_paths():
+        for record in records:
+            if not record.image_path:
+                print(f"Skipping {record.record_id}: no image to detect objects in")
+                continue
+            pending.append(record)
+            yield record.image_path
+
+    for detection in engine.detect(image_paths()):
+        record = pending.popleft()
+        while record.image_path != detection.source:
+            # The engine drops images it cannot decode
+            print(f"Skipping {record.record_id}: image could not be decoded")
+            record = pending.popleft()
+        yield record._replace(boxes=detection.boxes)
+
+
+def translate_descriptions(records, nl_parser):
+    # Replace free-text descriptions with triple descriptions, batching the texts through spaCy's nlp.pipe
+    records, texts = itertools.tee(records)
+    descriptions = nl_parser.pipe(record.description for record in texts)
+    for record, description in zip(records, descriptions):
+        yield record._replace(description=description)
+
+
+def process_record(generator, record):
+    # Build the record's triples into its own scene graph and return it with the scene's URI
+    # Keying the scene on the record id makes its instance URIs independent of the worker that builds it
+    scene_graph = generator.begin_scene(record.record_id)
+    scene_description = generator.parse_scene_description(record.description)
+    scene_instance_uri = generator.generate_instance_from_scene_description(scene_description)
+    if record.boxes is not None:
+        add_detection_triples(generator, scene_instance_uri, record.boxes)
+    return scene_graph, scene_instance_uri
+
+
+def init_worker(ontology_path, seed=None, id_scheme="counter", metrics_config=None):
+    global _worker_generator
+    if metrics_config is not None:
+        metrics.configure(**metrics_config)
+    if _worker_generator is None or _worker_generator.ontology_path != ontology_path:
+        _worker_generator = SceneGraphGenerator(ontology_path, verbose=False)
+    # Every process uses the same seed, so scene-keyed instance URIs agree no matter where a scene runs
+    _worker_generator.id_allocator = ID_ALLOCATORS[id_scheme](seed)
+
+
+def generate_scene(record, output_format, keep_triples):
+    # Runs in a worker: build the scene's delta graph and hand back its serialized form (and triples for merging)
+    try:
+        with metrics.scene(record.record_id):
+            scene_graph, scene_instance_uri = process_record(_worker_generator, record)
+            with metrics.timer("serialize"):
+                data = scene_graph.serialize(format=output_format)
+        triples = list(scene_graph) if keep_triples else None
+        return record.record_id, scene_instance_uri, data, triples, None
+    except Exception as e:
+        return record.record_id, None, None, None, str(e)
+
+
+def write_scene_graph(data, output_dir, record_id, output_format):
+    destination = os.path.join(output_dir, record_id + OUTPUT_EXTENSIONS[output_format])
+    with open(destination, "w", encoding="utf-8") as f:
+        f.write(data)
+    return destination
+
+
+def run_pipeline(source, output_dir, ontology_path="ravdKGMerged1.owl", output_format="turtle",
+                 workers=1, merged_output=None, chunksize=16, detection_engine=None, scene_log=None,
+                 seed=None, id_scheme="counter", natural_language=None):
+    # Workers record metrics the same way as this process (see Metrics.metrics.configure)
+    metrics_config = metrics.config() if metrics.enabled else None
+    if scene_log is not None:
+        # Scenes are appended to the log as N-Triples turned into named-graph quads
+        output_format = "nt"
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+    records = iter_records(source, require_description=detection_engine is None)
+    if detection_engine is not None:
+        records = attach_detections(records, detection_engine)
+    # Load the ontology in the parent first so forked workers inherit it copy-on-write
+    if seed is None:
+        # Workers need a shared seed to agree on URIs; draw one per run when none is given
+        seed = uuid.uuid4().hex
+    init_worker(ontology_path, seed, id_scheme, metrics_config)
+    if natural_language is not None:
+        # spaCy runs here, ahead of the pool, so workers only see ordinary triple descriptions
+        from NaturalLanguageParser import NaturalLanguageParser
+        nl_parser = NaturalLanguageParser.from_generator(_worker_generator, **natural_language)
+        records = translate_descriptions(records, nl_parser)
+    task = partial(generate_scene, output_format=output_format, keep_triples=merged_output is not None)
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(ontology_path, seed, id_scheme, metrics_config))
+        results = pool.imap_unordered(task, records, chunksize)
+    else:
+        results = map(task, records)
+
+    merged_graph = None
+    if merged_output is not None:
+        merged_graph = Graph()
+        _worker_generator.bind_namespaces(merged_graph)
+
+    processed = failed = 0
+    start = time.perf_counter()
+    try:
+        for record_id, scene_instance_uri, data, triples, error in results:
+            if error is not None:
+                print(f"Error processing {record_id}:", error)
+                failed += 1
+                continue
+            if scene_log is not None:
+                scene_log.append_ntriples(data, scene_instance_uri)
+            else:
+                write_scene_graph(data, output_dir, record_id, output_format)
+            if merged_graph is not None:
+                merged_graph.addN((s, p, o, merged_graph) for s, p, o in triples)
+            processed += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if merged_graph is not None:
+        merged_graph.serialize(destination=merged_output, format=output_format)
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed * 3600 if elapsed else 0.0
+    print(f"Processed {processed} scenes ({failed} failed) in {elapsed:.1f}s, {rate:.0f} scenes/hour")
+    return processed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scene graphs without the GUI")
+    parser.add_argument("source", help="Directory of images with matching .txt descriptions, or a JSONL manifest")
+    parser.add_argument("--output-dir", default="scene_graphs")
+    parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    parser.add_argument("--format", choices=sorted(OUTPUT_EXTENSIONS), default="turtle")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--merged-output", help="Also merge every scene graph into this single file")
+    parser.add_argument("--log", help="Append each scene as a named graph to this N-Quads log instead of "
+                                      "writing one file per scene")
+    parser.add_argument("--detect", action="store_true",
+                        help="Run YOLO on each image and add the detected objects and their spatial relations")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--detection-cache", help="Reuse detections of unchanged images from this directory")
+    parser.add_argument("--seed", help="Seed for instance URIs; the same seed and input give identical URIs")
+    parser.add_argument("--id-scheme", choices=sorted(ID_ALLOCATORS), default="counter",
+                        help="Instance URI style: readable counters or fixed-length content hashes")
+    parser.add_argument("--natural-language", action="store_true",
+                        help="Descriptions are free text; parse them into triples with spaCy first")
+    parser.add_argument("--spacy-model", default="en_core_web_sm")
+    parser.add_argument("--nlp-processes", type=int, default=1, help="Processes for spaCy's nlp.pipe")
+    parser.add_argument("--metrics", help="Append per-scene timers and counters to this JSON lines file")
+    parser.add_argument("--profile-dir", help="Write a cProfile dump per scene to this directory")
+    parser.add_argument("--trace-memory", action="store_true", help="Record each scene's peak memory (slower)")
+    args = parser.parse_args()
+
+    if args.metrics or args.profile_dir or args.trace_memory:
+        metrics.configure(json_lines_path=args.metrics, profile_dir=args.profile_dir, trace_memory=args.trace_memory)
+    detection_engine = None
+    if args.detect:
+        from DetectionCache import DetectionCache
+        from DetectionEngine import DetectionEngine
+        cache = DetectionCache(args.detection_cache) if args.detection_cache else None
+        detection_engine = DetectionEngine(args.model, cache=cache)
+    scene_log = SceneLog(args.log) if args.log else None
+    natural_language = None
+    if args.natural_language:
+        natural_language = {"model": args.spacy_model, "n_process": args.nlp_processes}
+    run_pipeline(args.source, args.output_dir, args.ontology, args.format, args.workers, args.merged_output,
+                 detection_engine=detection_engine, scene_log=scene_log, seed=args.seed, id_scheme=args.id_scheme,
+                 natural_language=natural_language)
+
+
+if __name__ == "__main__":
+    main()
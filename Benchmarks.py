@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from OntologySnapshot import load_ontology, parse_ontology, snapshot_key, snapshot_path_for, write_snapshot
+
+# Classes that are always available to synthetic scenes in addition to the ontology's vehicle subclasses
+PERSON_CLASSES = ["Pedestrian", "Rider"]
+# Modules checked by the import-time budget, and the heavy dependencies none of them may pull in at import
+BUDGET_MODULES = ["SceneGraphGenerator", "BatchPipeline", "VideoIngest", "SceneGraphService", "MyWindow", "DetectObjects"]
+HEAVY_MODULES = ["cv2", "ultralytics", "torch", "spacy", "PIL"]
+# Allowed import time per module; also enforced by test_import_budget.py
+IMPORT_BUDGET_MS = 500.0
+SYNTHETIC_RELATIONS = ["isBehind", "isAhead", "isOn", "isOnLane", "isAheadLeft", "isNear", "isLeftOf"]
+
+
+def time_call(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def benchmark_startup(ontology_path, repeat):
+    # Make sure a fresh snapshot exists so the snapshot timings measure a warm load only
+    write_snapshot(parse_ontology(ontology_path), snapshot_key(ontology_path), snapshot_path_for(ontology_path))
+
+    parse_timings, parsed = time_call(lambda: parse_ontology(ontology_path), repeat)
+    snapshot_timings, loaded = time_call(lambda: load_ontology(ontology_path), repeat)
+    if len(parsed) != len(loaded):
+        raise RuntimeError(f"Snapshot has {len(loaded)} triples, source has {len(parsed)}")
+
+    parse_median = statistics.median(parse_timings)
+    snapshot_median = statistics.median(snapshot_timings)
+    print(f"Triples:        {len(parsed)}")
+    print(f"Cold parse:     median {parse_median * 1000:.1f} ms, min {min(parse_timings) * 1000:.1f} ms")
+    print(f"Snapshot load:  median {snapshot_median * 1000:.1f} ms, min {min(snapshot_timings) * 1000:.1f} ms")
+    print(f"Speedup:        {parse_median / snapshot_median:.1f}x")
+
+
+def measure_import(module_name):
+    # A fresh interpreter per module, so nothing is already cached in sys.modules
+    probe = ("import json, sys, time\n"
+             "start = time.perf_counter()\n"
+             f"import {module_name}\n"
+             "seconds = time.perf_counter() - start\n"
+             f"print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))")
+    completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+    if completed.returncode != 0:
+        return None, completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"
+    return json.loads(completed.stdout.strip().splitlines()[-1]), None
+
+
+def check_import_budget(module_names, budget_ms, repeat):
+    failures = 0
+    for module_name in module_names:
+        measurements = []
+        for _ in range(repeat):
+            measurement, error = measure_import(module_name)
+            if error is not None:
+                break
+            measurements.append(measurement)
+        if not measurements:
+            # Optional GUI dependencies may be missing on headless machines; that is not a budget failure
+            print(f"{module_name:22s} skipped ({error})")
+            continue
+        milliseconds = statistics.median(m["seconds"] for m in measurements) * 1000
+        heavy = measurements[-1]["heavy"]
+        over_budget = milliseconds > budget_ms
+        status = "OK" if not (over_budget or heavy) else "FAIL"
+        print(f"{module_name:22s} {milliseconds:8.1f} ms  {status}" + (f"  eagerly imports {', '.join(heavy)}" if heavy else ""))
+        if over_budget or heavy:
+            failures += 1
+    return failures
+
+
+def vehicle_subclasses(generator):
+    # Named subclasses of the vehicle classes, usable as "<Class><n>" identifiers in a scene description
+    vehicle_uris = {generator.MY_NS["TwoWheeledVehicle"], generator.MY_NS["FourWheeledVehicle"]}
+    class_names = []
+    for class_uri, ancestors in generator.ancestors_of.items():
+        class_name = str(class_uri)[len(generator.MY_NS):]
+        if str(class_uri).startswith(str(generator.MY_NS)) and class_name.isalpha() and not vehicle_uris.isdisjoint(ancestors):
+            class_names.append(class_name)
+    return sorted(class_names)
+
+
+def synthetic_scene_description(rng, triples, participants, class_names):
+    # Participants are drawn from a fixed pool so larger scenes also exercise instance reuse
+    pool = [f"{rng.choice(class_names)}{index + 1}" for index in range(max(2, participants))]
+    lines = []
+    for _ in range(triples):
+        subject, obj = rng.sample(pool, 2)
+        lines.append(f"{subject} {rng.choice(SYNTHETIC_RELATIONS)} {obj}")
+    return "\n".join(lines)
+
+
+def measure_stage(func, repeat, setup=None):
+    # Timed runs go without tracemalloc (it slows allocation down); one extra traced run gives the peak
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - start)
+
+    argument = setup() if setup else None
+    tracemalloc.start()
+    try:
+        func(argument)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "peak_bytes": peak_bytes}
+
+
+def benchmark_stages(ontology_path, repeat, triples, participants, vehicle_classes, seed):
+    from SceneGraphGenerator import SceneGraphGenerator
+
+    generator = SceneGraphGenerator(ontology_path, verbose=False)
+    class_names = vehicle_subclasses(generator)
+    if vehicle_classes:
+        class_names = class_names[:vehicle_classes]
+    description = synthetic_scene_description(random.Random(seed), triples, participants, class_names + PERSON_CLASSES)
+
+    def fresh_scene():
+        generator.begin_scene()
+
+    def scene_with_subjects():
+        generator.begin_scene()
+        return [(generator.get_or_create_instance(f"{class_name}{index}", class_name), class_name)
+                for index, class_name in enumerate(class_names + PERSON_CLASSES)]
+
+    def create_sensors(subjects):
+        for subject_instance_uri, class_name in subjects:
+            generator.create_instance_with_sensor(subject_instance_uri, class_name)
+
+    handle, destination = tempfile.mkstemp(suffix=".owl")
+    os.close(handle)
+    try:
+        stages = {
+            "init_graph": measure_stage(lambda _: generator.init_graph(), repeat),
+            "parse_scene_description": measure_stage(
+                lambda _: generator.parse_scene_description(description), repeat),
+            "analyze_scene_description": measure_stage(
+                lambda _: generator.analyze_scene_description(description), repeat, fresh_scene),
+            "generate_instance_from_scene_description": measure_stage(
+                lambda _: generator.generate_instance_from_scene_description(description), repeat, fresh_scene),
+            "create_instance_with_sensor": measure_stage(create_sensors, repeat, scene_with_subjects),
+            "serialize_graph": measure_stage(lambda _: generator.serialize_graph(destination), repeat),
+        }
+    finally:
+        os.remove(destination)
+
+    config = {"ontology": ontology_path, "repeat": repeat, "triples": triples, "participants": participants,
+              "vehicle_classes": len(class_names), "seed": seed}
+    return {"config": config, "stages": stages}
+
+
+def benchmark_query(ontology_path, scenes, triples, repeat, seed, query, compare_sparql=True):
+    from rdflib import Graph
+    from SceneGraphGenerator import SceneGraphGenerator
+    from SceneQuery import SceneIndex, relation_query_sparql
+
+    subject_class, predicate, object_class = query
+    generator = SceneGraphGenerator(ontology_path, verbose=False)
+    class_names = vehicle_subclasses(generator) + PERSON_CLASSES
+    rng = random.Random(seed)
+
+    # SPARQL needs the class hierarchy, so its graph holds the ontology plus every scene
+    combined = Graph()
+    if compare_sparql:
+        combined += generator.g
+    index = SceneIndex(generator.ancestors_of)
+    start = time.perf_counter()
+    for scene_number in range(scenes):
+        scene_graph = generator.begin_scene(f"scene{scene_number}")
+        description = synthetic_scene_description(rng, triples, triples, class_names)
+        generator.generate_instance_from_scene_description(description)
+        if compare_sparql:
+            combined.addN((s, p, o, combined) for s, p, o in scene_graph)
+        index.add_graph(scene_graph)
+    print(f"Generated and indexed {scenes} scenes in {time.perf_counter() - start:.1f}s")
+
+    index_timings, indexed = time_call(lambda: index.scenes_with_relation(subject_class, predicate, object_class), repeat)
+    print(f"Query:          scenes with a {subject_class} {predicate} a {object_class} ({len(indexed)} matches)")
+    print(f"SceneIndex:     median {statistics.median(index_timings) * 1000:.2f} ms")
+    if not compare_sparql:
+        return
+    sparql = relation_query_sparql(subject_class, predicate, object_class)
+    sparql_timings, rows = time_call(lambda: {row.scene for row in combined.query(sparql)}, repeat)
+    if indexed != rows:
+        raise RuntimeError(f"Index found {len(indexed)} scenes, SPARQL found {len(rows)}")
+
+    print(f"SPARQL:         median {statistics.median(sparql_timings) * 1000:.2f} ms")
+    print(f"Speedup:        {statistics.median(sparql_timings) / statistics.median(index_timings):.0f}x")
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for stage, measurement in results["stages"].items():
+        reference = baseline.get("stages", {}).get(stage)
+        if reference and measurement["median_s"] > reference["median_s"] * (1 + tolerance):
+            regressions.append((stage, reference["median_s"], measurement["median_s"]))
+    return regressions
+
+
+def report_stages(results):
+    print(f"Scene: {results['config']['triples']} triples, {results['config']['participants']} participants, "
+          f"{results['config']['vehicle_classes']} vehicle classes")
+    for stage, measurement in results["stages"].items():
+        print(f"{stage:42s} median {measurement['median_s'] * 1000:9.2f} ms  min {measurement['min_s'] * 1000:9.2f} ms"
+              f"  peak {measurement['peak_bytes'] / 1024 / 1024:8.2f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the scene graph generation hot paths")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    startup_parser = subparsers.add_parser("startup", help="Compare cold ontology parsing with snapshot loading")
+    startup_parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+
+    stages_parser = subparsers.add_parser("stages", help="Time and peak memory per scene generation stage")
+    stages_parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    stages_parser.add_argument("--repeat", type=int, default=5)
+    stages_parser.add_argument("--triples", type=int, default=200, help="Statements in the synthetic scene")
+    stages_parser.add_argument("--participants", type=int, default=50, help="Distinct instances in the scene")
+    stages_parser.add_argument("--vehicle-classes", type=int, default=0, help="Limit the vehicle subclasses used (0 = all)")
+    stages_parser.add_argument("--seed", type=int, default=0)
+    stages_parser.add_argument("--output", help="Write the results as JSON")
+    stages_parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    stages_parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown over the baseline median")
+
+    budget_parser = subparsers.add_parser("import-budget",
+                                          help="Fail if a module imports too slowly or pulls in a heavy dependency")
+    budget_parser.add_argument("modules", nargs="*", default=BUDGET_MODULES)
+    budget_parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                               help="Allowed median import time per module")
+    budget_parser.add_argument("--repeat", type=int, default=3)
+
+    query_parser = subparsers.add_parser("query", help="Compare SceneIndex with SPARQL on a relation query")
+    query_parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    query_parser.add_argument("--scenes", type=int, default=200)
+    query_parser.add_argument("--triples", type=int, default=8, help="Statements per synthetic scene")
+    query_parser.add_argument("--repeat", type=int, default=3)
+    query_parser.add_argument("--seed", type=int, default=0)
+    query_parser.add_argument("--no-sparql", action="store_true",
+                              help="Only time the index (SPARQL property paths get slow beyond a few hundred scenes)")
+    query_parser.add_argument("--query", nargs=3, default=["Rider", "isNear", "FourWheeledVehicle"],
+                              metavar=("SUBJECT_CLASS", "PREDICATE", "OBJECT_CLASS"))
+
+    args = parser.parse_args()
+    if args.benchmark == "query":
+        benchmark_query(args.ontology, args.scenes, args.triples, args.repeat, args.seed, args.query, not args.no_sparql)
+    elif args.benchmark == "import-budget":
+        if check_import_budget(args.modules, args.budget_ms, args.repeat):
+            sys.exit(1)
+    elif args.benchmark == "startup":
+        benchmark_startup(args.ontology, args.repeat)
+    elif args.benchmark == "stages":
+        results = benchmark_stages(args.ontology, args.repeat, args.triples, args.participants,
+                                   args.vehicle_classes, args.seed)
+        report_stages(results)
+        if args.output:
+            with open(args.output, "w") as output_file:
+                json.dump(results, output_file, indent=2)
+        if args.baseline:
+            with open(args.baseline) as baseline_file:
+                regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+            for stage, reference, measured in regressions:
+                print(f"REGRESSION {stage}: {reference * 1000:.2f} ms -> {measured * 1000:.2f} ms")
+            if regressions:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
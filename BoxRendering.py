@@ -0,0 +1,83 @@
+import numpy as np
+
+# COCO class names in YOLO's 0-based class id order
+COCO_LABELS = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat", "traffic light",
+    "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
+    "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch",
+    "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard",
+    "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush",
+)
+# Box color (BGR) per class id; ids beyond the table wrap around
+BOX_COLORS = (
+    (89, 161, 197), (67, 161, 255), (19, 222, 24), (186, 55, 2), (167, 146, 11), (190, 76, 98),
+    (130, 172, 179), (115, 209, 128), (204, 79, 135), (136, 126, 185), (209, 213, 45), (44, 52, 10),
+    (101, 158, 121), (179, 124, 12), (25, 33, 189), (45, 115, 11), (73, 197, 184), (62, 225, 221),
+    (32, 46, 52), (20, 165, 16), (54, 15, 57), (12, 150, 9), (10, 46, 99), (94, 89, 46), (48, 37, 106),
+    (42, 10, 96), (7, 164, 128), (98, 213, 120), (40, 5, 219), (54, 25, 150), (251, 74, 172), (0, 236, 196),
+    (21, 104, 190), (226, 74, 232), (120, 67, 25), (191, 106, 197), (8, 15, 134), (21, 2, 1), (142, 63, 109),
+    (133, 148, 146), (187, 77, 253), (155, 22, 122), (218, 130, 77), (164, 102, 79), (43, 152, 125),
+    (185, 124, 151), (95, 159, 238), (128, 89, 85), (228, 6, 60), (6, 41, 210), (11, 1, 133), (30, 96, 58),
+    (230, 136, 109), (126, 45, 174), (164, 63, 165), (32, 111, 29), (232, 40, 70), (55, 31, 198),
+    (148, 211, 129), (10, 186, 211), (181, 201, 94), (55, 35, 92), (129, 140, 233), (70, 250, 116),
+    (61, 209, 152), (216, 21, 138), (100, 0, 176), (3, 42, 70), (151, 13, 44), (216, 102, 88), (125, 216, 93),
+    (171, 236, 47), (253, 127, 103), (205, 137, 244), (193, 137, 224), (36, 152, 214), (17, 50, 238),
+    (154, 165, 67), (114, 129, 60), (119, 24, 48),
+)
+
+
+def to_numpy(boxes):
+    # YOLO returns a tensor (results[0].boxes.data); convert it once instead of element by element
+    if hasattr(boxes, "cpu"):
+        boxes = boxes.cpu().numpy()
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+
+
+def select_boxes(boxes, conf=None):
+    boxes = to_numpy(boxes)
+    if conf:
+        boxes = boxes[boxes[:, 4] > conf]
+    return boxes
+
+
+def box_labels(boxes, score=True, labels=COCO_LABELS):
+    class_ids = boxes[:, 5].astype(int).tolist()
+    names = [labels[class_id] if 0 <= class_id < len(labels) else str(class_id) for class_id in class_ids]
+    if not score:
+        return names
+    return [f"{name} {percent:.1f}%" for name, percent in zip(names, np.round(boxes[:, 4] * 100, 1).tolist())]
+
+
+def draw_boxes(image, boxes, conf=None, score=True, show_labels=True, labels=COCO_LABELS, colors=BOX_COLORS,
+               txt_color=(255, 255, 255)):
+    """Draw YOLO boxes (x1, y1, x2, y2, confidence, class id) above conf onto image in place and return it."""
+    import cv2
+
+    boxes = select_boxes(boxes, conf)
+    if not len(boxes):
+        return image
+    lw = max(round(sum(image.shape) / 2 * 0.003), 2)
+    corners = boxes[:, :4].astype(np.int32)
+    class_ids = boxes[:, 5].astype(int)
+
+    # Outlines: one polylines call per class instead of one rectangle call per box
+    outlines = np.stack([corners[:, [0, 1]], corners[:, [2, 1]], corners[:, [2, 3]], corners[:, [0, 3]]], axis=1)
+    for class_id in np.unique(class_ids):
+        color = colors[class_id % len(colors)]
+        cv2.polylines(image, list(outlines[class_ids == class_id]), True, color, lw, cv2.LINE_AA)
+
+    if show_labels:
+        tf = max(lw - 1, 1)  # font thickness
+        for (x1, y1), label, class_id in zip(corners[:, :2].tolist(), box_labels(boxes, score, labels), class_ids.tolist()):
+            color = colors[class_id % len(colors)]
+            w, h = cv2.getTextSize(label, 0, fontScale=lw / 3, thickness=tf)[0]  # text width, height
+            outside = y1 - h >= 3
+            cv2.rectangle(image, (x1, y1), (x1 + w, y1 - h - 3 if outside else y1 + h + 3), color, -1, cv2.LINE_AA)
+            cv2.putText(image, label, (x1, y1 - 2 if outside else y1 + h + 2), 0, lw / 3, txt_color,
+                        thickness=tf, lineType=cv2.LINE_AA)
+    return image
+
@@ -0,0 +1,187 @@
+import numpy as np
+from rdflib import RDF
+
+from Metrics import metrics, timed
+
+# YOLO (COCO) class ids that have a counterpart in the ontology
+COCO_TO_ONTOLOGY = {
+    0: "Pedestrian",      # person
+    1: "Bicycle",         # bicycle
+    2: "Car",             # car
+    3: "MotorBicycle",    # motorcycle
+    5: "PublicBus",       # bus
+    7: "Truck",           # truck
+    9: "TrafficLight",    # traffic light
+    11: "RegulatorySign", # stop sign
+}
+MAPPED_CLASS_IDS = np.array(sorted(COCO_TO_ONTOLOGY), dtype=np.int64)
+PERSON_CLASS_ID = 0
+TWO_WHEELER_CLASS_IDS = np.array([1, 3], dtype=np.int64)
+
+# Ontology properties used for pairwise spatial relations between detections
+LEFT_OF_RELATION = "isLeftOf"
+NEAR_RELATION = "isNear"
+OVERLAPS_RELATION = "overlapping"
+RIDES_RELATION = "isOn"
+
+
+def pairwise_intersections(xyxy):
+    # (N, N) intersection areas of every box pair via broadcasting
+    x1, y1, x2, y2 = (xyxy[:, i] for i in range(4))
+    widths = np.clip(np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :]), 0, None)
+    heights = np.clip(np.minimum(y2[:, None], y2[None, :]) - np.maximum(y1[:, None], y1[None, :]), 0, None)
+    return widths * heights
+
+
+def spatial_relation_matrices(xyxy, near_factor=1.0):
+    """Boolean (N, N) matrices for left-of, near and overlaps, computed for all pairs at once.
+
+    left_of[i, j] means box i lies entirely to the left of box j. near and overlaps are symmetric
+    and only set above the diagonal so each pair is reported once.
+    """
+    n = len(xyxy)
+    intersections = pairwise_intersections(xyxy)
+    centers = np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2], axis=1)
+    diagonals = np.hypot(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1])
+    distances = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis=-1)
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+
+    left_of = xyxy[:, 2][:, None] <= xyxy[:, 0][None, :]
+    overlaps = (intersections > 0) & upper
+    near = (distances <= near_factor * np.maximum(diagonals[:, None], diagonals[None, :])) & upper
+    return left_of, near, overlaps
+
+
+def assign_riders(xyxy, class_ids, min_coverage=0.3):
+    # A person whose box is largely covered by a bicycle/motorcycle box is riding it
+    rider_of = np.full(len(class_ids), -1, dtype=np.int64)
+    persons = np.flatnonzero(class_ids == PERSON_CLASS_ID)
+    two_wheelers = np.flatnonzero(np.isin(class_ids, TWO_WHEELER_CLASS_IDS))
+    if len(persons) == 0 or len(two_wheelers) == 0:
+        return rider_of
+    intersections = pairwise_intersections(xyxy)[np.ix_(persons, two_wheelers)]
+    person_areas = (xyxy[persons, 2] - xyxy[persons, 0]) * (xyxy[persons, 3] - xyxy[persons, 1])
+    coverage = intersections / np.maximum(person_areas, 1e-6)[:, None]
+    best = coverage.argmax(axis=1)
+    is_rider = coverage[np.arange(len(persons)), best] >= min_coverage
+    rider_of[persons[is_rider]] = two_wheelers[best[is_rider]]
+    return rider_of
+
+
+def select_mapped_boxes(boxes, conf=0.5):
+    # Keep confident boxes whose COCO class maps to an ontology class, in one vectorized pass
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    class_ids = boxes[:, 5].astype(np.int64)
+    keep = (boxes[:, 4] >= conf) & np.isin(class_ids, MAPPED_CLASS_IDS)
+    return boxes[keep], class_ids[keep]
+
+
+def create_detection_instances(generator, scene_instance_uri, class_ids, rider_of, name_prefix="", track_ids=None,
+                               track_instances=None):
+    # With track ids, an object already seen keeps its instance and sensors: track_instances maps each track id to
+    # (instance URI, class names already declared) and outlives the scene, so later windows of a video reuse it too
+    created = []
+    for index, class_id in enumerate(class_ids.tolist()):
+        class_name = "Rider" if rider_of[index] >= 0 else COCO_TO_ONTOLOGY[class_id]
+        if track_ids is None:
+            instance_name = f"{class_name}{name_prefix}_{index}"
+        else:
+            # Keyed on the track alone, so a person getting on or off a bicycle stays one instance
+            track_id = int(track_ids[index])
+            instance_name = f"Track{track_id}"
+            tracked = track_instances.get(track_id)
+            if tracked is not None:
+                metrics.increment("tracked_instances_reused")
+                instance_uri, declared_classes = tracked
+                generator.existing_instances[instance_name] = instance_uri
+                if class_name not in declared_classes:
+                    # e.g. a tracked Pedestrian now riding a bicycle also becomes a Rider, with a Rider's sensors
+                    declared_classes.add(class_name)
+                    generator.scene_graph.add((instance_uri, RDF.type, generator.MY_NS[class_name]))
+                    generator.create_instance_with_sensor(instance_uri, class_name)
+                if generator.is_participant_class(class_name):
+                    generator.add_scene_participant(scene_instance_uri, instance_uri)
+                created.append((instance_uri, class_name))
+                continue
+        instance_uri = generator.get_or_create_instance(instance_name, class_name)
+        generator.create_instance_with_sensor(instance_uri, class_name)
+        if track_ids is not None:
+            track_instances[track_id] = (instance_uri, {class_name})
+        if generator.is_participant_class(class_name):
+            generator.add_scene_participant(scene_instance_uri, instance_uri)
+        created.append((instance_uri, class_name))
+    return created
+
+
+def observed_statement_quads(generator, statements, instant_uri):
+    # Tracked instances persist across frames, so a bare triple could not say when it held (A left of B in one
+    # frame, B left of A in the next); each relation becomes a reified statement tied to its frame's instant
+    scene_graph = generator.scene_graph
+    has_time = generator.TIME_NS["hasTime"]
+    quads = []
+    for subject_uri, property_uri, object_uri in statements:
+        statement_uri = generator.new_instance_uri("Observation")
+        quads.append((statement_uri, RDF.type, RDF.Statement, scene_graph))
+        quads.append((statement_uri, RDF.subject, subject_uri, scene_graph))
+        quads.append((statement_uri, RDF.predicate, property_uri, scene_graph))
+        quads.append((statement_uri, RDF.object, object_uri, scene_graph))
+        quads.append((statement_uri, has_time, instant_uri, scene_graph))
+    return quads
+
+
+def add_spatial_relations(generator, instance_uris, xyxy, rider_of=None, near_factor=1.0, instant_uri=None):
+    """Relate detected instances to each other from their boxes with one bulk insertion.
+
+    With instant_uri, the relations are added as statements observed at that instant instead of plain triples.
+    """
+    if len(instance_uris) < 2:
+        return 0
+    left_of, near, overlaps = spatial_relation_matrices(xyxy, near_factor)
+    statements = []
+    for relation_name, matrix in ((LEFT_OF_RELATION, left_of), (NEAR_RELATION, near), (OVERLAPS_RELATION, overlaps)):
+        rows, cols = np.nonzero(matrix)
+        if len(rows) == 0:
+            continue
+        property_uri = generator.add_new_relation(relation_name)
+        statements.extend((instance_uris[i], property_uri, instance_uris[j]) for i, j in zip(rows.tolist(), cols.tolist()))
+    if rider_of is not None:
+        riders = np.flatnonzero(rider_of >= 0)
+        if len(riders):
+            property_uri = generator.add_new_relation(RIDES_RELATION)
+            statements.extend((instance_uris[i], property_uri, instance_uris[rider_of[i]]) for i in riders.tolist())
+    scene_graph = generator.scene_graph
+    if instant_uri is None:
+        scene_graph.addN((s, p, o, scene_graph) for s, p, o in statements)
+    else:
+        scene_graph.addN(observed_statement_quads(generator, statements, instant_uri))
+    return len(statements)
+
+
+@timed("add_detection_triples")
+def add_detection_triples(generator, scene_instance_uri, boxes, conf=0.5, name_prefix="", near_factor=1.0,
+                          tracker=None, instant_uri=None, track_instances=None):
+    """Turn a YOLO boxes array/tensor (results[0].boxes.data) into scene instances and spatial relations.
+
+    With an ObjectTracker fed every frame in order, instances are keyed on track ids instead of box order;
+    pass the frame's instant_uri as well so that the relations between them are time-stamped, and the same
+    track_instances dict for every frame of a video so that a track is declared only once.
+    """
+    triples_before = len(generator.scene_graph) if metrics.enabled else 0
+    if hasattr(boxes, "cpu"):
+        boxes = boxes.cpu().numpy()
+    boxes, class_ids = select_mapped_boxes(boxes, conf)
+    xyxy = boxes[:, :4]
+    rider_of = assign_riders(xyxy, class_ids)
+    track_ids = None
+    if tracker is not None:
+        track_ids = tracker.update(xyxy, class_ids)
+        if track_instances is None:
+            track_instances = {}
+    created = create_detection_instances(generator, scene_instance_uri, class_ids, rider_of, name_prefix, track_ids,
+                                         track_instances)
+    add_spatial_relations(generator, [instance_uri for instance_uri, _ in created], xyxy, rider_of, near_factor,
+                          instant_uri)
+    if metrics.enabled:
+        metrics.increment("objects_detected", len(created))
+        metrics.increment("triples_added", len(generator.scene_graph) - triples_before)
+    return created
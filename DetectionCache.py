@@ -0,0 +1,120 @@
+import argparse
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from Metrics import metrics
+
+CACHE_SUFFIX = ".npy"
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """On-disk cache of YOLO outputs, one (N, 6) float32 .npy file per image.
+
+    Entries are keyed by the hash of the encoded image bytes, the model weights and the confidence threshold,
+    so a changed image, model or threshold never hits a stale entry. When the cache grows past max_bytes the
+    least recently used entries are deleted; recency survives restarts through the files' modification times.
+    """
+
+    def __init__(self, cache_dir="detection_cache", max_bytes=256 * 1024 * 1024, mmap=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mmap_mode = "r" if mmap else None
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        found = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(CACHE_SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+                found.append((stat.st_mtime, file_name[:-len(CACHE_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def key(image_digest, model_digest, conf):
+        return hashlib.sha256(f"{image_digest}:{model_digest}:{conf!r}".encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        if key not in self.entries:
+            metrics.increment("detection_cache_misses")
+            return None
+        path = self.path_for(key)
+        try:
+            boxes = np.load(path, mmap_mode=self.mmap_mode)
+            os.utime(path)  # Mark as recently used for the next process too
+        except (OSError, ValueError):
+            # Deleted or truncated behind our back; treat as a miss
+            self.discard(key)
+            metrics.increment("detection_cache_misses")
+            return None
+        self.entries.move_to_end(key)
+        metrics.increment("detection_cache_hits")
+        return boxes
+
+    def put(self, key, boxes):
+        path = self.path_for(key)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(boxes, dtype=np.float32))
+        os.replace(temporary_path, path)  # Readers in other processes never see a partial entry
+        self.total_bytes -= self.entries.pop(key, 0)
+        size = os.path.getsize(path)
+        self.entries[key] = size
+        self.total_bytes += size
+        self.evict()
+
+    def discard(self, key):
+        self.total_bytes -= self.entries.pop(key, 0)
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self.discard(next(iter(self.entries)))
+
+    def clear(self):
+        for key in list(self.entries):
+            self.discard(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the on-disk detection cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--cache-dir", default="detection_cache")
+    args = parser.parse_args()
+
+    cache = DetectionCache(args.cache_dir)
+    if args.command == "clear":
+        cache.clear()
+    print(f"{len(cache)} entries, {cache.total_bytes / 1024:.1f} KiB in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
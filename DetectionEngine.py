@@ -0,0 +1,168 @@
+import argparse
+import hashlib
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from DetectionCache import DetectionCache, file_digest
+from Metrics import timed
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# image is the decoded BGR frame; boxes is an (N, 6) float32 array of x1, y1, x2, y2, confidence, class id
+Detection = namedtuple("Detection", ["source", "image", "boxes"])
+
+
+def iter_image_paths(directory):
+    for file_name in sorted(os.listdir(directory)):
+        if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS:
+            yield os.path.join(directory, file_name)
+
+
+def read_image(source):
+    # Paths are decoded to BGR (what YOLO expects for NumPy input) and returned with the sha256 of their bytes,
+    # which keys the detection cache; frames are passed through untouched and have no digest
+    if isinstance(source, np.ndarray):
+        return source, None
+    with open(source, "rb") as f:
+        image_bytes = f.read()
+    return decode_image_bytes(image_bytes, source), hashlib.sha256(image_bytes).hexdigest()
+
+
+def decode_image_bytes(image_bytes, source="image"):
+    import cv2  # Deferred: OpenCV adds noticeably to startup and only image paths need it
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode {source}")
+    return image
+
+
+class DetectionEngine:
+    def __init__(self, model_path="yolov8n.pt", batch_size=8, decode_workers=4, conf=0.25, device="cpu", cache=None):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.conf = conf
+        self.device = device
+        self.cache = cache
+        self.model = None
+        self.model_digest = None
+
+    def load_model(self):
+        if self.model is None:
+            from ultralytics import YOLO
+            self.model = YOLO(self.model_path)
+        return self.model
+
+    def warm_up(self):
+        # Load the weights and run one tiny prediction so the first real image does not pay for initialization
+        self.predict_batch([np.zeros((64, 64, 3), dtype=np.uint8)])
+
+    @timed("yolo_predict")
+    def predict_batch(self, images):
+        results = self.load_model().predict(images, conf=self.conf, device=self.device, verbose=False)
+        return [result.boxes.data.cpu().numpy().astype(np.float32, copy=False) for result in results]
+
+    def weights_digest(self):
+        if self.model_digest is None:
+            if not os.path.exists(self.model_path):
+                self.load_model()  # ultralytics downloads named weights on first load
+            # Fall back to the name when the weights live outside the working directory
+            self.model_digest = file_digest(self.model_path) if os.path.exists(self.model_path) else self.model_path
+        return self.model_digest
+
+    def cache_key(self, image_digest):
+        if self.cache is None or image_digest is None:
+            return None
+        return DetectionCache.key(image_digest, self.weights_digest(), self.conf)
+
+    def predict_cached(self, images, image_digests):
+        # Cached images skip inference; only the misses go to the model, in a single batch
+        keys = [self.cache_key(image_digest) for image_digest in image_digests]
+        boxes_per_image = [self.cache.get(key) if key else None for key in keys]
+        missing = [index for index, boxes in enumerate(boxes_per_image) if boxes is None]
+        if missing:
+            predicted = self.predict_batch([images[index] for index in missing])
+            for index, boxes in zip(missing, predicted):
+                boxes_per_image[index] = boxes
+                if keys[index]:
+                    self.cache.put(keys[index], boxes)
+        return boxes_per_image
+
+    def iter_decoded(self, sources, executor):
+        # Keep a bounded window of decode jobs in flight so large folders never sit in memory at once
+        pending = deque()
+        window = max(self.batch_size * 2, self.decode_workers)
+        for source in sources:
+            pending.append((source, executor.submit(read_image, source)))
+            if len(pending) >= window:
+                yield self.take_decoded(pending)
+        while pending:
+            yield self.take_decoded(pending)
+
+    @staticmethod
+    def take_decoded(pending):
+        source, future = pending.popleft()
+        try:
+            image, image_digest = future.result()
+            return source, image, image_digest
+        except Exception as e:
+            print("Error decoding image:", e)
+            return source, None, None
+
+    def detect(self, sources):
+        """Yield a Detection per image path or frame, decoding in the background and predicting in batches."""
+        with ThreadPoolExecutor(max_workers=self.decode_workers) as executor:
+            batch = []
+            for source, image, image_digest in self.iter_decoded(sources, executor):
+                if image is None:
+                    continue
+                batch.append((source, image, image_digest))
+                if len(batch) >= self.batch_size:
+                    yield from self.run_batch(batch)
+                    batch = []
+            if batch:
+                yield from self.run_batch(batch)
+
+    def run_batch(self, batch):
+        boxes_per_image = self.predict_cached([image for _, image, _ in batch], [digest for _, _, digest in batch])
+        for (source, image, _), boxes in zip(batch, boxes_per_image):
+            yield Detection(source, image, boxes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run batched YOLO detection over a folder of images")
+    parser.add_argument("directory")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--decode-workers", type=int, default=4)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--cache-dir", help="Reuse detections of unchanged images from this on-disk cache")
+    parser.add_argument("--annotate-dir", help="Also write each image with its boxes drawn to this directory")
+    args = parser.parse_args()
+
+    cache = DetectionCache(args.cache_dir) if args.cache_dir else None
+    engine = DetectionEngine(args.model, args.batch_size, args.decode_workers, args.conf, cache=cache)
+    engine.load_model()
+    if args.annotate_dir:
+        import cv2
+        from BoxRendering import draw_boxes
+        os.makedirs(args.annotate_dir, exist_ok=True)
+
+    count = 0
+    start = time.perf_counter()
+    for detection in engine.detect(iter_image_paths(args.directory)):
+        count += 1
+        print(f"{detection.source}: {len(detection.boxes)} objects")
+        if args.annotate_dir:
+            annotated = draw_boxes(detection.image, detection.boxes, args.conf)
+            cv2.imwrite(os.path.join(args.annotate_dir, os.path.basename(detection.source)), annotated)
+    elapsed = time.perf_counter() - start
+    print(f"Detected {count} images in {elapsed:.1f}s ({count / elapsed if elapsed else 0.0:.1f} images/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+
+class WorkerCancelled(Exception):
+    pass
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, str)  # percent done, label of the stage that is starting
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class PipelineWorker(QRunnable):
+    """Runs a list of (label, stage) steps on a QThreadPool thread, passing each stage's result to the next.
+
+    Signals are delivered on the GUI thread. cancel() takes effect at the next stage boundary, after which
+    cleanup (if given) is called with the last stage result so half-built work can be discarded.
+    """
+
+    def __init__(self, stages, cleanup=None):
+        super().__init__()
+        self.stages = stages
+        self.cleanup = cleanup
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        value = None
+        try:
+            for index, (label, stage) in enumerate(self.stages):
+                if self.cancel_event.is_set():
+                    raise WorkerCancelled()
+                self.signals.progress.emit(int(100 * index / len(self.stages)), label)
+                value = stage(value)
+            self.signals.progress.emit(100, "Done")
+            self.signals.result.emit(value)
+        except WorkerCancelled:
+            self.run_cleanup(value)
+            self.signals.error.emit("Cancelled")
+        except Exception as e:
+            self.run_cleanup(value)
+            self.signals.error.emit(str(e))
+        finally:
+            self.signals.finished.emit()
+
+    def run_cleanup(self, value):
+        if self.cleanup is not None:
+            try:
+                self.cleanup(value)
+            except Exception as e:
+                print("Error cleaning up cancelled work:", e)
+
+
+def pixmap_from_bgr(image):
+    # Wrap a BGR NumPy frame for display in a QLabel without going through cv2 windows
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    q_image = QImage(image.data, width, height, image.strides[0], QImage.Format_RGB888).rgbSwapped()
+    return QPixmap.fromImage(q_image)
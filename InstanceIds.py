@@ -0,0 +1,50 @@
+import hashlib
+import uuid
+
+
+def short_digest(text, length=8):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:length]
+
+
+class CounterIdAllocator:
+    """Allocates instance identifiers from per-name monotonic counters.
+
+    Identifiers look like "Car_<scope>_<n>". The scope is derived from the seed (random when no seed is
+    given, so separate runs and processes never collide) and, when a scene key is passed to begin_scope(),
+    from that key as well. Scene-keyed identifiers therefore depend only on the seed and the scene, not on
+    which worker process generated it, which keeps parallel outputs reproducible and merge-safe.
+    Scene keys must be unique within a run.
+    """
+
+    def __init__(self, seed=None):
+        self.run_prefix = short_digest(f"seed:{seed}") if seed is not None else uuid.uuid4().hex[:8]
+        self.run_counters = {}
+        self.scope = self.run_prefix
+        self.counters = self.run_counters
+
+    def begin_scope(self, scope_key=None):
+        if scope_key is None:
+            # Unkeyed scenes share the run scope and keep counting, so identifiers stay unique across them
+            self.scope = self.run_prefix
+            self.counters = self.run_counters
+        else:
+            self.scope = short_digest(f"{self.run_prefix}/{scope_key}", 12)
+            self.counters = {}
+
+    def next_count(self, name):
+        count = self.counters.get(name, 0) + 1
+        self.counters[name] = count
+        return count
+
+    def allocate(self, name):
+        return f"{name}_{self.scope}_{self.next_count(name)}"
+
+
+class HashIdAllocator(CounterIdAllocator):
+    """Like CounterIdAllocator, but hashes scope, name and occurrence into a fixed-length identifier."""
+
+    def allocate(self, name):
+        return f"{name}_{short_digest(f'{self.scope}/{name}/{self.next_count(name)}', 16)}"
+
+
+ID_ALLOCATORS = {"counter": CounterIdAllocator, "hash": HashIdAllocator}
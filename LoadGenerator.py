@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+SUBJECT_CLASSES = ["Car", "Bicycle", "Rider", "Pedestrian", "Truck", "Jeep", "MotorBicycle"]
+RELATIONS = ["isBehind", "isAhead", "isOn", "isOnLane", "isAheadLeft"]
+
+
+def random_description(rng, triples):
+    lines = []
+    for index in range(triples):
+        subject = f"{rng.choice(SUBJECT_CLASSES)}{index}"
+        obj = f"{rng.choice(SUBJECT_CLASSES)}{index + 1}"
+        lines.append(f"{subject} {rng.choice(RELATIONS)} {obj}")
+    return "\n".join(lines)
+
+
+async def post_scene(host, port, body):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((f"POST /scene-graph HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(host, port, requests, concurrency, triples, seed):
+    rng = random.Random(seed)
+    bodies = [json.dumps({"description": random_description(rng, triples)}).encode("utf-8") for _ in range(requests)]
+    latencies = []
+    statuses = {}
+    next_index = 0
+
+    async def client():
+        nonlocal next_index
+        while next_index < len(bodies):
+            body = bodies[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                status = await post_scene(host, port, body)
+            except OSError:
+                status = "connection error"
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"Requests:    {requests} at concurrency {concurrency} ({triples} triples each)")
+    print(f"Statuses:    {statuses}")
+    print(f"Throughput:  {len(latencies) / elapsed:.1f} scenes/s over {elapsed:.1f}s")
+    print(f"Latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms")
+    print(f"Latency p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a running SceneGraphService")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--triples", type=int, default=8, help="Triples per synthetic scene description")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(run_load(args.host, args.port, args.requests, args.concurrency, args.triples, args.seed))
+
+
+if __name__ == "__main__":
+    main()
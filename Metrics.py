@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+# Returned by timer() and scene() while metrics are disabled, so instrumented code pays a single call
+NULL_CONTEXT = contextlib.nullcontext()
+
+
+class StageTimer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Counters and stage timers for the scene graph pipeline, disabled (and nearly free) until configure() is called.
+
+    Timers keep a count, total and maximum per stage. Inside scene(), everything recorded is also written as
+    one JSON line per scene, optionally with that scene's cProfile dump and tracemalloc peak.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.json_lines_path = None
+        self.profile_dir = None
+        self.trace_memory = False
+        self.scene_maxima = None  # Per-stage maximum within the scene being captured
+        self.reset()
+
+    def configure(self, enabled=True, json_lines_path=None, profile_dir=None, trace_memory=False):
+        self.enabled = enabled
+        self.json_lines_path = json_lines_path
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def config(self):
+        # Passed to pool workers so they record the same way as the parent process
+        return {"enabled": self.enabled, "json_lines_path": self.json_lines_path,
+                "profile_dir": self.profile_dir, "trace_memory": self.trace_memory}
+
+    def reset(self):
+        self.counters = {}
+        self.timers = {}
+        self.peak_bytes = 0
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        if self.scene_maxima is not None and seconds > self.scene_maxima.get(name, 0.0):
+            self.scene_maxima[name] = seconds
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def timer(self, name):
+        return StageTimer(self, name) if self.enabled else NULL_CONTEXT
+
+    def scene(self, scene_id):
+        return self.capture_scene(scene_id) if self.enabled else NULL_CONTEXT
+
+    @contextlib.contextmanager
+    def capture_scene(self, scene_id):
+        counters_before = dict(self.counters)
+        timers_before = {name: list(timer) for name, timer in self.timers.items()}
+        outer_scene_maxima, self.scene_maxima = self.scene_maxima, {}
+        profiler = cProfile.Profile() if self.profile_dir else None
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{safe_file_name(scene_id)}.prof"))
+            self.observe("scene", time.perf_counter() - start)
+            peak_bytes = None
+            if tracing:
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.peak_bytes = max(self.peak_bytes, peak_bytes)
+            scene_maxima, self.scene_maxima = self.scene_maxima, outer_scene_maxima
+            if outer_scene_maxima is not None:
+                for name, seconds in scene_maxima.items():
+                    outer_scene_maxima[name] = max(outer_scene_maxima.get(name, 0.0), seconds)
+            if self.json_lines_path:
+                self.append_json_line(scene_record(scene_id, counters_before, timers_before, self, peak_bytes,
+                                                   scene_maxima))
+
+    def append_json_line(self, record):
+        # A single short append per scene, so worker processes can share the file
+        with open(self.json_lines_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def merge(self, record):
+        # Fold one scene's JSON line into these totals
+        for name, amount in record.get("counters", {}).items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for name, (count, total, maximum) in record.get("timers", {}).items():
+            timer = self.timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += count
+            timer[1] += total
+            timer[2] = max(timer[2], maximum)
+        self.peak_bytes = max(self.peak_bytes, record.get("peak_bytes") or 0)
+
+    def prometheus_text(self, prefix="scene_graph"):
+        lines = []
+        for name in sorted(self.counters):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {self.counters[name]}")
+        if self.timers:
+            lines.append(f"# TYPE {prefix}_stage_seconds summary")
+            for name in sorted(self.timers):
+                count, total, _ = self.timers[name]
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {count}')
+            lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+            for name in sorted(self.timers):
+                lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {self.timers[name][2]:.6f}')
+        if self.peak_bytes:
+            lines.append(f"# TYPE {prefix}_scene_peak_bytes gauge")
+            lines.append(f"{prefix}_scene_peak_bytes {self.peak_bytes}")
+        return "\n".join(lines) + "\n"
+
+
+def timed(name):
+    # Decorator form of metrics.timer() for whole functions and methods
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            with StageTimer(metrics, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def safe_file_name(scene_id):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(scene_id))
+
+
+def scene_record(scene_id, counters_before, timers_before, metrics, peak_bytes, scene_maxima):
+    counters = {name: amount - counters_before.get(name, 0) for name, amount in metrics.counters.items()
+                if amount != counters_before.get(name, 0)}
+    timers = {}
+    for name, (count, total, _) in metrics.timers.items():
+        count_before, total_before, _ = timers_before.get(name, (0, 0.0, 0.0))
+        if count != count_before:
+            timers[name] = [count - count_before, total - total_before, scene_maxima.get(name, 0.0)]
+    return {"scene": str(scene_id), "timestamp": time.time(), "counters": counters, "timers": timers,
+            "peak_bytes": peak_bytes}
+
+
+def load_json_lines(path):
+    totals = Metrics()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                totals.merge(json.loads(line))
+    return totals
+
+
+# Process-wide instance used by the instrumented modules
+metrics = Metrics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize per-scene metrics written as JSON lines")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prometheus_parser = subparsers.add_parser("prometheus", help="Aggregate a JSON lines file into Prometheus text")
+    prometheus_parser.add_argument("json_lines", help="Per-scene metrics written with --metrics")
+    prometheus_parser.add_argument("--output", help="Write to this file instead of stdout (e.g. for node_exporter)")
+    args = parser.parse_args()
+
+    if args.command == "prometheus":
+        text = load_json_lines(args.json_lines).prometheus_text()
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            print(text, end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import re
+
+from DetectionBridge import LEFT_OF_RELATION, NEAR_RELATION
+from Metrics import metrics, timed
+
+# Components the dependency-based extraction never reads; leaving them out roughly halves spaCy's time per text
+DISABLED_COMPONENTS = ["ner", "entity_ruler", "entity_linker", "textcat", "textcat_multilabel", "senter"]
+# Everyday words for ontology classes, used only when the class exists in the vocabulary
+CLASS_SYNONYMS = {
+    "bike": "Bicycle", "cyclist": "Rider", "biker": "Rider", "motorcycle": "MotorBicycle", "motorbike": "MotorBicycle",
+    "person": "Pedestrian", "walker": "Pedestrian", "bus": "PublicBus", "lorry": "Truck", "automobile": "Car",
+    "stop sign": "RegulatorySign", "signal": "TrafficLight",
+}
+# Spatial relations the detection bridge creates; not in the ontology file but shared with detected scenes
+SPATIAL_RELATIONS = [LEFT_OF_RELATION, NEAR_RELATION]
+# Phrasings of relations that do not follow from the property names; verbs are given by their lemma
+RELATION_SYNONYMS = {
+    "front of": "isAhead", "next to": "isNear", "close to": "isNear", "beside": "isNear", "by": "isNear",
+    "on top of": "isOn", "ride": "isOn", "overlap": "overlapping",
+}
+DEFINITE_DETERMINERS = {"the", "this", "that", "these", "those"}
+CAMEL_CASE_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def vocabulary_key(name):
+    # "TrafficLight" -> "traffic light", "isLeftOf" -> "left of"
+    words = [word.lower() for word in CAMEL_CASE_WORD.findall(name)]
+    if len(words) > 1 and words[0] == "is":
+        words = words[1:]
+    return " ".join(words)
+
+
+class NaturalLanguageParser:
+    """Turns free-text scene descriptions into "Subject1 relation Object1" lines with spaCy's dependency parse.
+
+    Noun phrases are matched against the ontology's classes and prepositional phrases ("behind", "to the left
+    of", "near") against its object properties, as listed by SceneGraphGenerator.list_entities_and_relations.
+    The output is an ordinary scene description, so the rest of the pipeline is unchanged. Texts are processed
+    in batches through nlp.pipe, optionally across processes.
+    """
+
+    def __init__(self, entities, relations, model="en_core_web_sm", n_process=1, batch_size=64):
+        self.class_keys = {vocabulary_key(name): name for name in entities}
+        self.class_keys.update({synonym: name for synonym, name in CLASS_SYNONYMS.items() if name in entities})
+        relations = set(relations) | set(SPATIAL_RELATIONS)
+        self.relation_keys = {vocabulary_key(name): name for name in relations}
+        self.relation_keys.update({phrase: name for phrase, name in RELATION_SYNONYMS.items() if name in relations})
+        self.model = model
+        self.n_process = n_process
+        self.batch_size = batch_size
+        self.nlp = None
+
+    @classmethod
+    def from_generator(cls, generator, **kwargs):
+        entities, relations = generator.list_entities_and_relations()
+        return cls(entities, relations, **kwargs)
+
+    def load_nlp(self):
+        if self.nlp is None:
+            import spacy  # Deferred: loading spaCy and its model takes seconds
+            self.nlp = spacy.load(self.model, exclude=DISABLED_COMPONENTS)
+        return self.nlp
+
+    def parse(self, text):
+        nlp = self.load_nlp()
+        with metrics.timer("natural_language_parse"):
+            doc = nlp(text)
+        return self.description_of(doc)
+
+    def pipe(self, texts):
+        # Yields one scene description per text, in order
+        docs = self.load_nlp().pipe(texts, n_process=self.n_process, batch_size=self.batch_size)
+        while True:
+            # spaCy parses a whole batch on the first next() of each batch, so the timer sees every batch in full
+            with metrics.timer("natural_language_parse"):
+                doc = next(docs, None)
+            if doc is None:
+                return
+            yield self.description_of(doc)
+
+    # Matching the parsed doc against the vocabulary; the parse itself is timed as natural_language_parse
+    @timed("natural_language_triples")
+    def description_of(self, doc):
+        mentions = MentionTable(self)
+        lines = []
+        for relation_name, subject_tokens, object_tokens in self.relations_in(doc):
+            for object_token in object_tokens:
+                object_identifier = mentions.identifier(object_token)
+                for subject_token in subject_tokens:
+                    subject_identifier = mentions.identifier(subject_token)
+                    if subject_identifier and object_identifier and subject_identifier != object_identifier:
+                        line = f"{subject_identifier} {relation_name} {object_identifier}"
+                        if line not in lines:
+                            lines.append(line)
+        return "\n".join(lines)
+
+    def relations_in(self, doc):
+        # Yields (relation name, subject tokens, object tokens) for prepositional phrases and verb objects
+        for token in doc:
+            if token.dep_ in ("prep", "agent"):
+                relation_name, subject_tokens = self.relation_of(token)
+                if relation_name is None:
+                    continue
+                for pobj in (child for child in token.children if child.dep_ == "pobj"):
+                    yield relation_name, subject_tokens, [pobj] + list(pobj.conjuncts)
+            elif token.dep_ == "dobj":
+                # "a rider riding a bicycle", "a cyclist wearing a helmet"
+                relation_name = self.lookup_relation([token.head.lemma_.lower(), token.head.lower_])
+                subject_tokens = self.subjects_of(token.head) if relation_name else []
+                if not subject_tokens and token.head.dep_ == "acl":
+                    subject_tokens = [token.head.head]
+                if relation_name and subject_tokens:
+                    yield relation_name, subject_tokens, [token] + list(token.conjuncts)
+
+    def lookup_relation(self, candidates):
+        for candidate in candidates:
+            relation_name = self.relation_keys.get(candidate)
+            if relation_name is not None:
+                return relation_name
+        return None
+
+    def relation_of(self, preposition):
+        # Returns the relation named by a prepositional phrase and the noun tokens it applies to
+        head = preposition.head
+        if head.dep_ in ("pobj", "advmod", "acomp", "npadvmod") or head.pos_ in ("ADV", "ADJ"):
+            # "ahead of", "close to", "to the left of": the word the preposition hangs off carries the meaning
+            relation_name = self.lookup_relation([f"{head.lower_} {preposition.lower_}", head.lower_])
+            return (relation_name, self.subjects_of(head)) if relation_name else (None, [])
+        relation_name = self.lookup_relation([preposition.lower_, f"{head.lemma_.lower()} {preposition.lower_}"])
+        if relation_name is None:
+            return None, []
+        if head.pos_ in ("NOUN", "PROPN"):
+            # "a rider on a bicycle": the phrase modifies the noun itself
+            return relation_name, [head] + list(head.conjuncts)
+        return relation_name, self.subjects_of(head)
+
+    @staticmethod
+    def subjects_of(token):
+        # Climb to the clause that owns the phrase and return its subject(s)
+        for _ in range(6):
+            for child in token.children:
+                if child.dep_ in ("nsubj", "nsubjpass"):
+                    return [child] + list(child.conjuncts)
+            if token.head is token:
+                break
+            token = token.head
+        return []
+
+    def class_of(self, token):
+        # Longest match first over the noun and its compound/adjective modifiers: "four wheeled vehicle", "vehicle"
+        modifiers = [child.lower_ for child in token.lefts if child.dep_ in ("compound", "amod", "nummod")]
+        words = modifiers + [token.lemma_.lower()]
+        for start in range(len(words)):
+            class_name = self.class_keys.get(" ".join(words[start:]))
+            if class_name is not None:
+                return class_name
+        return self.class_keys.get(token.lower_)
+
+
+class MentionTable:
+    """Assigns instance identifiers to noun mentions: "a car" starts a new Car, "the car" refers to the last one."""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.identifiers = {}
+        self.counts = {}
+        self.last_of_class = {}
+
+    def identifier(self, token):
+        if token.i in self.identifiers:
+            return self.identifiers[token.i]
+        class_name = self.parser.class_of(token)
+        identifier = None
+        if class_name is not None:
+            definite = any(child.dep_ == "det" and child.lower_ in DEFINITE_DETERMINERS for child in token.children)
+            if definite and class_name in self.last_of_class:
+                identifier = self.last_of_class[class_name]
+            else:
+                self.counts[class_name] = self.counts.get(class_name, 0) + 1
+                identifier = f"{class_name}{self.counts[class_name]}"
+            self.last_of_class[class_name] = identifier
+        self.identifiers[token.i] = identifier
+        return identifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert free-text scene descriptions into triple descriptions")
+    parser.add_argument("texts", nargs="+", help="Text files, one scene description each")
+    parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    parser.add_argument("--model", default="en_core_web_sm")
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    from SceneGraphGenerator import SceneGraphGenerator
+    nl_parser = NaturalLanguageParser.from_generator(SceneGraphGenerator(args.ontology, verbose=False), model=args.model,
+                                                     n_process=args.n_process, batch_size=args.batch_size)
+
+    def read_texts():
+        for path in args.texts:
+            with open(path, encoding="utf-8") as f:
+                yield f.read()
+
+    for path, description in zip(args.texts, nl_parser.pipe(read_texts())):
+        print(f"# {path}")
+        print(description)
+
+
+if __name__ == "__main__":
+    main()
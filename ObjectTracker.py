@@ -0,0 +1,87 @@
+import numpy as np
+
+from Metrics import metrics
+
+
+def box_iou(a, b):
+    # (len(a), len(b)) IoU of every box pair via broadcasting
+    widths = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    heights = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersections = widths * heights
+    areas_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    areas_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersections / np.maximum(areas_a[:, None] + areas_b[None, :] - intersections, 1e-6)
+
+
+def box_centers(xyxy):
+    return np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2], axis=1)
+
+
+class ObjectTracker:
+    """Assigns stable track ids to the detections of consecutive frames from one camera.
+
+    Every track is scored against every detection of the same class at once: by IoU, or, for fast movers
+    whose boxes no longer overlap (e.g. when only every n-th frame is sampled), by how close the centers are
+    relative to the track's box diagonal. Pairs are then matched greedily from the best score down.
+    Unmatched detections start new tracks; tracks unmatched for more than max_missed frames are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_center_distance=0.5, max_missed=5):
+        self.iou_threshold = iou_threshold
+        self.max_center_distance = max_center_distance
+        self.max_missed = max_missed
+        self.next_track_id = 1
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.class_ids = np.empty(0, dtype=np.int64)
+        self.missed = np.empty(0, dtype=np.int64)
+
+    def match_scores(self, xyxy, class_ids):
+        # (tracks, detections) scores; IoU matches always outrank center-distance matches
+        iou = box_iou(self.boxes, xyxy)
+        diagonals = np.hypot(self.boxes[:, 2] - self.boxes[:, 0], self.boxes[:, 3] - self.boxes[:, 1])
+        distances = np.linalg.norm(box_centers(self.boxes)[:, None, :] - box_centers(xyxy)[None, :, :], axis=-1)
+        relative_distances = distances / np.maximum(diagonals, 1e-6)[:, None]
+        center_scores = np.clip(1 - relative_distances / self.max_center_distance, 0, None) * self.iou_threshold
+        scores = np.where(iou >= self.iou_threshold, 1 + iou, center_scores)
+        scores[self.class_ids[:, None] != class_ids[None, :]] = 0
+        return scores
+
+    def update(self, xyxy, class_ids):
+        """Track one frame's boxes (N, 4) and class ids (N,); returns the (N,) track id of each box."""
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        assigned = np.zeros(len(xyxy), dtype=np.int64)
+        matched_tracks = np.zeros(len(self.track_ids), dtype=bool)
+
+        if len(self.track_ids) and len(xyxy):
+            scores = self.match_scores(xyxy, class_ids)
+            track_indices, detection_indices = np.nonzero(scores > 0)
+            order = np.argsort(-scores[track_indices, detection_indices], kind="stable")
+            for track_index, detection_index in zip(track_indices[order].tolist(), detection_indices[order].tolist()):
+                if matched_tracks[track_index] or assigned[detection_index]:
+                    continue
+                matched_tracks[track_index] = True
+                assigned[detection_index] = self.track_ids[track_index]
+                self.boxes[track_index] = xyxy[detection_index]
+
+        # Age the tracks that were not seen and forget the ones gone for too long
+        self.missed = np.where(matched_tracks, 0, self.missed + 1)
+        keep = self.missed <= self.max_missed
+        self.track_ids, self.boxes = self.track_ids[keep], self.boxes[keep]
+        self.class_ids, self.missed = self.class_ids[keep], self.missed[keep]
+
+        new = np.flatnonzero(assigned == 0)
+        if len(new):
+            new_ids = np.arange(self.next_track_id, self.next_track_id + len(new), dtype=np.int64)
+            self.next_track_id += len(new)
+            assigned[new] = new_ids
+            self.track_ids = np.concatenate([self.track_ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, xyxy[new]])
+            self.class_ids = np.concatenate([self.class_ids, class_ids[new]])
+            self.missed = np.concatenate([self.missed, np.zeros(len(new), dtype=np.int64)])
+            metrics.increment("tracks_started", len(new))
+        return assigned
+
+    def __len__(self):
+        return len(self.track_ids)
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import pickle
+import sys
+import time
+
+import rdflib
+from rdflib import Graph
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def source_hash(source_path):
+    # Hash the ontology file contents so the snapshot is only reused for identical sources
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path_for(source_path):
+    return source_path + SNAPSHOT_SUFFIX
+
+
+def snapshot_key(source_path):
+    # The rdflib version is part of the key because pickled stores are not portable across releases
+    return (SNAPSHOT_VERSION, rdflib.__version__, source_hash(source_path))
+
+
+def parse_ontology(source_path):
+    g = Graph()
+    g.parse(source_path)
+    return g
+
+
+def write_snapshot(g, key, snapshot_path):
+    # Write to a temporary file first so concurrent readers never see a partial snapshot
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(g, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_snapshot(key, snapshot_path):
+    try:
+        with open(snapshot_path, "rb") as f:
+            if pickle.load(f) != key:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print("Ignoring unreadable ontology snapshot:", e)
+        return None
+
+
+def load_ontology(source_path="ravdKGMerged1.owl", use_snapshot=True):
+    """Load the ontology graph, reusing the compiled snapshot when the source is unchanged."""
+    if not use_snapshot:
+        return parse_ontology(source_path)
+
+    key = snapshot_key(source_path)
+    snapshot_path = snapshot_path_for(source_path)
+    g = read_snapshot(key, snapshot_path)
+    if g is not None:
+        return g
+
+    g = parse_ontology(source_path)
+    try:
+        write_snapshot(g, key, snapshot_path)
+    except OSError as e:
+        print("Could not write ontology snapshot:", e)
+    return g
+
+
+def main():
+    # Rebuild the snapshot explicitly, e.g. after editing the ontology in Protege
+    source_path = sys.argv[1] if len(sys.argv) > 1 else "ravdKGMerged1.owl"
+    start = time.perf_counter()
+    g = parse_ontology(source_path)
+    write_snapshot(g, snapshot_key(source_path), snapshot_path_for(source_path))
+    print(f"Compiled {len(g)} triples to {snapshot_path_for(source_path)} in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from rdflib import OWL, RDF, RDFS
+
+from Metrics import metrics
+
+
+class OntologyVocabulary:
+    """Memoized "is this a class / an object property" lookups against the ontology graph.
+
+    Each URI is looked up in the rdflib store once; the answer (including "not declared") is kept in a dict,
+    together with the class's direct superclasses. Schema triples added through note_schema_triple() update
+    the memo, so it stays coherent with the graph. hits and misses count answers served from the memo and
+    from the store.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.classes = {}  # class URI -> tuple of direct superclasses, or None when not declared
+        self.relations = {}  # property URI -> whether it is declared an ObjectProperty
+        self.hits = 0
+        self.misses = 0
+
+    def superclasses(self, class_uri):
+        # None when class_uri is not an owl:Class
+        try:
+            superclasses = self.classes[class_uri]
+        except KeyError:
+            self.count_miss()
+            if (class_uri, RDF.type, OWL.Class) in self.graph:
+                superclasses = tuple(self.graph.objects(class_uri, RDFS.subClassOf))
+            else:
+                superclasses = None
+            self.classes[class_uri] = superclasses
+            return superclasses
+        self.count_hit()
+        return superclasses
+
+    def has_class(self, class_uri):
+        return self.superclasses(class_uri) is not None
+
+    def has_relation(self, relation_uri):
+        try:
+            declared = self.relations[relation_uri]
+        except KeyError:
+            self.count_miss()
+            declared = self.relations[relation_uri] = (relation_uri, RDF.type, OWL.ObjectProperty) in self.graph
+            return declared
+        self.count_hit()
+        return declared
+
+    def note_schema_triple(self, triple):
+        # Keep the memo in step with a triple just added to the graph
+        s, p, o = triple
+        if p == RDF.type and o == OWL.Class:
+            self.classes[s] = self.classes.get(s) or ()
+        elif p == RDFS.subClassOf and self.classes.get(s) is not None:
+            self.classes[s] += (o,)
+        elif p == RDF.type and o == OWL.ObjectProperty:
+            self.relations[s] = True
+
+    def count_hit(self):
+        self.hits += 1
+        metrics.increment("vocabulary_cache_hits")
+
+    def count_miss(self):
+        self.misses += 1
+        metrics.increment("vocabulary_cache_misses")
+
+    def __len__(self):
+        return len(self.classes) + len(self.relations)
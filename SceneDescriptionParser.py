@@ -0,0 +1,78 @@
+import io
+import re
+import sys
+
+# Identifiers are "<ClassName><digits>", e.g. Car1 -> Car
+INSTANCE_NUMBER_PATTERN = re.compile(r"\d+")
+# Bound on remembered identifier -> class name resolutions, for long-running processes with unique identifiers
+MAX_CACHED_IDENTIFIERS = 100000
+
+
+class ParsedDescription:
+    """A scene description reduced to interned (subject, predicate, object) triples.
+
+    subjects, objects and predicates hold each distinct token once, in order of first appearance, and
+    class_of maps every identifier to its class name. Lines that could not be parsed are kept in errors as
+    (line_number, line, reason) instead of aborting the parse.
+    """
+
+    __slots__ = ("triples", "subjects", "objects", "predicates", "class_of", "errors")
+
+    def __init__(self):
+        self.triples = []
+        self.subjects = {}
+        self.objects = {}
+        self.predicates = {}
+        self.class_of = {}
+        self.errors = []
+
+    def class_names(self):
+        return set(self.class_of.values())
+
+    def __len__(self):
+        return len(self.triples)
+
+
+class SceneDescriptionParser:
+    def __init__(self):
+        self.class_names = {}
+
+    def class_name_of(self, identifier):
+        class_name = self.class_names.get(identifier)
+        if class_name is None:
+            if len(self.class_names) >= MAX_CACHED_IDENTIFIERS:
+                self.class_names.clear()
+            class_name = sys.intern(INSTANCE_NUMBER_PATTERN.sub("", identifier))
+            self.class_names[identifier] = class_name
+        return class_name
+
+    def parse_lines(self, lines):
+        # Single pass over any iterable of lines (an open file streams without loading it whole)
+        parsed = ParsedDescription()
+        for line_number, line in enumerate(lines, 1):
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("#"):
+                continue  # Blank lines and comments
+            if len(tokens) != 3:
+                parsed.errors.append((line_number, line.strip(), f"expected 3 tokens, found {len(tokens)}"))
+                continue
+            subject, predicate, obj = (sys.intern(token) for token in tokens)
+            subject_class_name = self.class_name_of(subject)
+            object_class_name = self.class_name_of(obj)
+            if not subject_class_name or not object_class_name:
+                parsed.errors.append((line_number, line.strip(), "instance identifier has no class name"))
+                continue
+            parsed.class_of[subject] = subject_class_name
+            parsed.class_of[obj] = object_class_name
+            parsed.subjects[subject] = None
+            parsed.objects[obj] = None
+            parsed.predicates[predicate] = None
+            parsed.triples.append((subject, predicate, obj))
+        return parsed
+
+    def parse(self, scene_description):
+        return self.parse_lines(io.StringIO(scene_description))
+
+    def parse_file(self, path):
+        with open(path, encoding="utf-8") as f:
+            return self.parse_lines(f)
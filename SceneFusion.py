@@ -0,0 +1,296 @@
+import argparse
+import json
+import math
+import os
+import time
+from collections import namedtuple
+
+from rdflib import Literal, RDF
+
+from Metrics import metrics
+from SceneDescriptionParser import SceneDescriptionParser
+from SceneGraphGenerator import SceneGraphGenerator
+from SceneLog import SceneLog
+
+# location is the camera site and positions maps description identifiers to participant positions, both as (x, y)
+# in one projected, metric coordinate system shared by all sources
+Observation = namedtuple("Observation", ["source_id", "timestamp", "location", "description", "positions"],
+                         defaults=(None,))
+
+
+class FusedParticipant:
+    """One instance in a fused scene and the sightings merged into it; position is None when it was never located."""
+
+    __slots__ = ("class_name", "position", "count", "sources", "identifier")
+
+    def __init__(self, class_name, position, source_id):
+        self.class_name = class_name
+        self.position = position
+        self.count = 1
+        self.sources = {source_id}
+        self.identifier = None
+
+    def add(self, class_name, position, source_id):
+        # Running centroid of every sighting
+        self.count += 1
+        x, y = self.position
+        self.position = (x + (position[0] - x) / self.count, y + (position[1] - y) / self.count)
+        self.sources.add(source_id)
+        self.class_name = class_name
+
+
+class ParticipantGrid:
+    """Spatial hash of the participants seen in one fused scene.
+
+    Cells are merge_radius wide, so a sighting only has to be compared with the participants in its own and
+    the eight neighbouring cells. A sighting merges into the nearest compatible participant within merge_radius
+    that its source has not already contributed to: a camera that sees two cars side by side keeps two cars.
+    """
+
+    def __init__(self, merge_radius, is_kind_of=None):
+        self.merge_radius = merge_radius
+        self.is_kind_of = is_kind_of
+        self.cells = {}
+
+    def cell_of(self, position):
+        return math.floor(position[0] / self.merge_radius), math.floor(position[1] / self.merge_radius)
+
+    def merged_class(self, class_name, other_class_name):
+        # The more specific of two compatible classes ("Car" seen by one camera, "FourWheeledVehicle" by another)
+        if class_name == other_class_name:
+            return class_name
+        if self.is_kind_of is not None:
+            if self.is_kind_of(class_name, other_class_name):
+                return class_name
+            if self.is_kind_of(other_class_name, class_name):
+                return other_class_name
+        return None
+
+    def nearest(self, class_name, position, source_id):
+        cell_x, cell_y = self.cell_of(position)
+        best, best_distance = None, self.merge_radius
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for participant in self.cells.get((cell_x + dx, cell_y + dy), ()):
+                    if source_id in participant.sources or self.merged_class(class_name, participant.class_name) is None:
+                        continue
+                    distance = math.hypot(participant.position[0] - position[0], participant.position[1] - position[1])
+                    if distance <= best_distance:
+                        best, best_distance = participant, distance
+        return best
+
+    def add(self, participant):
+        self.cells.setdefault(self.cell_of(participant.position), []).append(participant)
+
+    def move(self, participant, old_position):
+        old_cell, new_cell = self.cell_of(old_position), self.cell_of(participant.position)
+        if old_cell != new_cell:
+            self.cells[old_cell].remove(participant)
+            self.cells.setdefault(new_cell, []).append(participant)
+
+
+class FusedScene:
+    """One consolidated scene: its participants and relations, plus where and when it was observed."""
+
+    def __init__(self, key):
+        self.key = key
+        self.participants = []
+        self.relations = {}  # (subject participant, predicate, object participant), deduplicated and in order
+        self.sources = set()
+        self.start = self.end = None
+        self.location_sum = [0.0, 0.0]
+        self.observation_count = 0
+        self.sightings = 0
+
+    def assign_identifiers(self):
+        # Numbered per class once merging is done, since a merge can settle on a more specific class
+        counts = {}
+        for participant in self.participants:
+            counts[participant.class_name] = counts.get(participant.class_name, 0) + 1
+            participant.identifier = f"{participant.class_name}{counts[participant.class_name]}"
+
+    @property
+    def description(self):
+        return "\n".join(f"{subject.identifier} {predicate} {obj.identifier}" for subject, predicate, obj in self.relations)
+
+    @property
+    def location(self):
+        return self.location_sum[0] / self.observation_count, self.location_sum[1] / self.observation_count
+
+
+class SceneFuser:
+    """Groups observations from several cameras by time window and site and fuses each group into one scene.
+
+    Observations whose timestamps fall in the same time_window-second bucket and whose locations fall in the
+    same site_size-metre grid cell form a group. Within a group, participants with a position are merged
+    through a ParticipantGrid; everything else keeps one instance per source. Identifiers are rewritten to
+    "<ClassName><n>" per fused scene, so the result is an ordinary scene description. Groups are emitted once
+    no observation can arrive for them any more, i.e. after allowed_lateness further time windows.
+    """
+
+    def __init__(self, time_window=1.0, site_size=50.0, merge_radius=2.0, is_kind_of=None, allowed_lateness=1):
+        self.time_window = time_window
+        self.site_size = site_size
+        self.merge_radius = merge_radius
+        self.is_kind_of = is_kind_of
+        self.allowed_lateness = allowed_lateness
+        self.parser = SceneDescriptionParser()
+        self.open_groups = {}
+        self.latest_window = None
+
+    def group_key(self, observation):
+        x, y = observation.location
+        return (math.floor(observation.timestamp / self.time_window),
+                math.floor(x / self.site_size), math.floor(y / self.site_size))
+
+    def add(self, observation):
+        # Returns the groups this observation closed, fused
+        key = self.group_key(observation)
+        if self.latest_window is not None and key[0] < self.latest_window - self.allowed_lateness:
+            print(f"Dropping late observation from {observation.source_id} at {observation.timestamp}")
+            return []
+        self.open_groups.setdefault(key, []).append(observation)
+        if self.latest_window is None or key[0] > self.latest_window:
+            self.latest_window = key[0]
+            return self.close_groups(self.latest_window - self.allowed_lateness)
+        return []
+
+    def close_groups(self, before_window=None):
+        closed = sorted(key for key in self.open_groups if before_window is None or key[0] < before_window)
+        return [self.fuse(key, self.open_groups.pop(key)) for key in closed]
+
+    def fuse_all(self, observations):
+        for observation in observations:
+            yield from self.add(observation)
+        yield from self.close_groups()
+
+    def fuse(self, key, observations):
+        scene = FusedScene(key)
+        grid = ParticipantGrid(self.merge_radius, self.is_kind_of)
+        for observation in observations:
+            scene.sources.add(observation.source_id)
+            scene.start = observation.timestamp if scene.start is None else min(scene.start, observation.timestamp)
+            scene.end = observation.timestamp if scene.end is None else max(scene.end, observation.timestamp)
+            scene.location_sum[0] += observation.location[0]
+            scene.location_sum[1] += observation.location[1]
+            scene.observation_count += 1
+            positions = observation.positions or {}
+            parsed = self.parser.parse(observation.description)
+
+            fused = {}
+            for identifier, class_name in parsed.class_of.items():
+                scene.sightings += 1
+                position = positions.get(identifier)
+                participant = None if position is None else grid.nearest(class_name, position, observation.source_id)
+                if participant is None:
+                    participant = FusedParticipant(class_name, position, observation.source_id)
+                    scene.participants.append(participant)
+                    if position is not None:
+                        grid.add(participant)
+                else:
+                    old_position = participant.position
+                    participant.add(grid.merged_class(class_name, participant.class_name), position, observation.source_id)
+                    grid.move(participant, old_position)
+                fused[identifier] = participant
+
+            for subject, predicate, obj in parsed.triples:
+                if fused[subject] is not fused[obj]:
+                    scene.relations[(fused[subject], predicate, fused[obj])] = None
+
+        scene.assign_identifiers()
+        metrics.increment("participants_merged", scene.sightings - len(scene.participants))
+        return scene
+
+
+def wkt_point(position):
+    return Literal(f"POINT({position[0]:.3f} {position[1]:.3f})", datatype=SceneGraphGenerator.GEOSPATIAL_NS["wktLiteral"])
+
+
+def add_geometry(generator, instance_uri, name, position):
+    geo_ns = generator.GEOSPATIAL_NS
+    geometry_uri = generator.get_or_create_instance(f"{name}Geometry", None)
+    generator.scene_graph.add((geometry_uri, RDF.type, geo_ns["Geometry"]))
+    generator.scene_graph.add((geometry_uri, geo_ns["asWKT"], wkt_point(position)))
+    generator.scene_graph.add((instance_uri, geo_ns["hasGeometry"], geometry_uri))
+
+
+def build_fused_scene(generator, scene, scene_id=None):
+    """Generate one scene graph for a FusedScene: its instances once, with where and when they were seen."""
+    time_ns = generator.TIME_NS
+    scene_graph = generator.begin_scene(scene_id)
+    scene_instance_uri = generator.generate_instance_from_scene_description(scene.description)
+    add_geometry(generator, scene_instance_uri, "Site", scene.location)
+    for participant in scene.participants:
+        instance_uri = generator.existing_instances.get(participant.identifier)
+        if instance_uri is None:
+            # Not in any relation (e.g. its only relation merged into a self-loop), so not in the description
+            generator.add_new_class(participant.class_name)
+            instance_uri = generator.get_or_create_instance(participant.identifier, participant.class_name)
+            generator.create_instance_with_sensor(instance_uri, participant.class_name)
+            if generator.is_participant_class(participant.class_name):
+                generator.add_scene_participant(scene_instance_uri, instance_uri)
+        if participant.position is not None:
+            add_geometry(generator, instance_uri, participant.identifier, participant.position)
+
+    interval_uri = generator.get_or_create_instance("ObservationWindow", None)
+    scene_graph.add((interval_uri, RDF.type, time_ns["ProperInterval"]))
+    scene_graph.add((interval_uri, time_ns["hasBeginning"], generator.add_time_instant("WindowStart", scene.start)))
+    scene_graph.add((interval_uri, time_ns["hasEnd"], generator.add_time_instant("WindowEnd", scene.end)))
+    scene_graph.add((scene_instance_uri, time_ns["hasTime"], interval_uri))
+    return scene_graph, scene_instance_uri
+
+
+def iter_observations(path):
+    # One JSON object per line: {"source", "timestamp", "location": [x, y], "description", "positions": {id: [x, y]}}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                positions = {identifier: tuple(position) for identifier, position in entry.get("positions", {}).items()}
+                yield Observation(str(entry["source"]), float(entry["timestamp"]), tuple(entry["location"]),
+                                  entry["description"], positions)
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                print(f"Skipping observation line {line_number}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuse simultaneous observations of one site from several cameras")
+    parser.add_argument("observations", help="JSON lines file of observations, in roughly increasing time order")
+    parser.add_argument("--output-dir", default="scene_graphs")
+    parser.add_argument("--log", help="Append each fused scene as a named graph to this N-Quads log")
+    parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    parser.add_argument("--time-window", type=float, default=1.0, help="Seconds of observations fused into one scene")
+    parser.add_argument("--site-size", type=float, default=50.0, help="Metres; cameras in one grid cell share a scene")
+    parser.add_argument("--merge-radius", type=float, default=2.0,
+                        help="Metres; sightings of one class closer than this are the same participant")
+    args = parser.parse_args()
+
+    scene_log = SceneLog(args.log) if args.log else None
+    if scene_log is None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    generator = SceneGraphGenerator(args.ontology, verbose=False)
+    fuser = SceneFuser(args.time_window, args.site_size, args.merge_radius, generator.is_kind_of)
+
+    scenes = sightings = participants = triples = 0
+    start = time.perf_counter()
+    for scene in fuser.fuse_all(iter_observations(args.observations)):
+        window, cell_x, cell_y = scene.key
+        scene_id = f"fused_{window}_{cell_x}_{cell_y}"
+        scene_graph, scene_instance_uri = build_fused_scene(generator, scene, scene_id)
+        if scene_log is not None:
+            # Named after the Scene instance, like every other scene log writer
+            scene_log.append(scene_graph, scene_instance_uri)
+        else:
+            scene_graph.serialize(destination=os.path.join(args.output_dir, f"{scene_id}.ttl"), format="turtle")
+        scenes += 1
+        sightings += scene.sightings
+        participants += len(scene.participants)
+        triples += len(scene_graph)
+    print(f"Fused {sightings} sightings into {participants} instances in {scenes} scenes ({triples} triples) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+from rdflib import Graph, Literal, RDF, URIRef, OWL, Namespace, RDFS, XSD
+from InstanceIds import CounterIdAllocator
+from Metrics import metrics, timed
+from SceneDescriptionParser import ParsedDescription, SceneDescriptionParser
+from OntologySnapshot import load_ontology
+from OntologyVocabulary import OntologyVocabulary
+from SensorTemplates import load_sensor_templates
+
+
+class SceneState:
+    """Everything generated for one scene: its graph plus the bookkeeping used while building it."""
+
+    def __init__(self, scene_id, graph):
+        self.scene_id = scene_id
+        self.graph = graph
+        self.scene_instance_uri = None
+        self.existing_instances = {}
+        self.instances_created = {}
+        self.bicycle_sensor_instances_created = set()
+        self.vehicle_sensor_instances_created = set()
+
+
+class SceneGraphGenerator:
+    MY_NS = Namespace("http://www.semanticweb.org/ardesilva/KnowledgeGraph#")
+    TIME_NS = Namespace("http://www.w3.org/2006/time#")
+    GEOSPATIAL_NS = Namespace("http://www.opengis.net/ont/geosparql#")
+    # Instances of (subclasses of) these classes are related to their scene as participants
+    PARTICIPANT_CLASSES = frozenset([MY_NS["TwoWheeledVehicle"], MY_NS["FourWheeledVehicle"], MY_NS["Person"]])
+
+    def __init__(self, ontology_path="ravdKGMerged1.owl", verbose=True, id_allocator=None):
+        self.ontology_path = ontology_path
+        self.verbose = verbose
+        # Instance URIs come from a collision-free allocator rather than random numbers
+        self.id_allocator = id_allocator if id_allocator is not None else CounterIdAllocator()
+        self.description_parser = SceneDescriptionParser()
+        self.init_graph()
+        # Instance triples go to scene_graph; it is the ontology graph itself unless begin_scene() was called
+        self.activate_scene(SceneState(None, self.g))
+
+    def init_graph(self):
+        # Initialize the RDF Graph
+        self.g = load_ontology(self.ontology_path)
+        self.bind_namespaces(self.g)
+
+        # Extract and store subClassOf values
+        self.subclass_of_map = {}
+        for subclass_of in self.g.objects(predicate=RDFS.subClassOf):
+            if subclass_of not in self.subclass_of_map:
+                self.subclass_of_map[subclass_of] = []
+            for class_uri in self.g.subjects(RDFS.subClassOf, subclass_of):
+                self.subclass_of_map[subclass_of].append(class_uri)
+
+        self.build_class_hierarchy_index()
+        self.vocabulary = OntologyVocabulary(self.g)
+        self.schema_additions = {}  # class/property URI -> schema triples added for it beyond the ontology file
+        self.sensor_templates = load_sensor_templates(self.g, self.MY_NS)
+
+    def build_class_hierarchy_index(self):
+        # Precompute every class's transitive superclasses so "is X a kind of Y" is a single set lookup
+        parents_of = {}
+        for superclass_uri, class_uris in self.subclass_of_map.items():
+            if not isinstance(superclass_uri, URIRef):
+                continue  # Skip anonymous restriction classes
+            for class_uri in class_uris:
+                parents_of.setdefault(class_uri, set()).add(superclass_uri)
+
+        self.ancestors_of = {}
+
+        def collect_ancestors(class_uri, visiting):
+            if class_uri in self.ancestors_of:
+                return self.ancestors_of[class_uri]
+            ancestors = set()
+            visiting.add(class_uri)
+            for parent_uri in parents_of.get(class_uri, ()):
+                ancestors.add(parent_uri)
+                if parent_uri not in visiting:  # Guard against subClassOf cycles
+                    ancestors |= collect_ancestors(parent_uri, visiting)
+            visiting.discard(class_uri)
+            self.ancestors_of[class_uri] = frozenset(ancestors)
+            return self.ancestors_of[class_uri]
+
+        for class_uri in parents_of:
+            collect_ancestors(class_uri, set())
+
+    def class_ancestors(self, class_name):
+        return self.ancestors_of.get(URIRef(self.MY_NS + class_name), frozenset())
+
+    def is_kind_of(self, class_name, superclass_name):
+        return self.MY_NS[superclass_name] in self.class_ancestors(class_name)
+
+    def is_participant_class(self, class_name):
+        return not self.PARTICIPANT_CLASSES.isdisjoint(self.class_ancestors(class_name))
+
+    @classmethod
+    def bind_namespaces(cls, graph):
+        graph.bind("my_ns", cls.MY_NS)
+        graph.bind("time_ns", cls.TIME_NS)
+        graph.bind("geospatial_ns", cls.GEOSPATIAL_NS)
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def create_instance(self, instance_uri, created_instance=None):
+        # Your instance creation logic here
+        self.instances_created[instance_uri] = created_instance
+
+    def begin_scene(self, scene_id=None):
+        # Start a fresh per-scene graph so only this scene's triples are collected and written
+        graph = Graph()
+        self.bind_namespaces(graph)
+        self.id_allocator.begin_scope(scene_id)
+        self.activate_scene(SceneState(scene_id, graph))
+        return self.scene_graph
+
+    def activate_scene(self, scene_state):
+        # Point the generator's working state at the given scene, e.g. to continue a resident scene
+        self.current_scene = scene_state
+        self.scene_graph = scene_state.graph
+        self.existing_instances = scene_state.existing_instances  # Dictionary to store existing instances
+        self.instances_created = scene_state.instances_created
+        self.bicycle_sensor_instances_created = scene_state.bicycle_sensor_instances_created
+        self.vehicle_sensor_instances_created = scene_state.vehicle_sensor_instances_created
+
+    def add_schema_triple(self, triple):
+        # Schema additions are kept in the ontology and copied into a separate scene graph so it stays self-contained
+        self.g.add(triple)
+        self.vocabulary.note_schema_triple(triple)
+        self.schema_additions.setdefault(triple[0], []).append(triple)
+        if self.scene_graph is not self.g:
+            self.scene_graph.add(triple)
+
+    def copy_schema_additions(self, uri):
+        # Every scene that uses an added class or property declares it too, not only the first one
+        if self.scene_graph is not self.g:
+            for triple in self.schema_additions.get(uri, ()):
+                self.scene_graph.add(triple)
+
+    def list_entities_and_relations(self):
+        classes = set(self.g.subjects(RDF.type, OWL.Class))
+        entities = [str(c).replace(str(self.MY_NS), "") for c in classes if str(c).startswith(str(self.MY_NS))]
+        entities += [str(c).replace(str(self.TIME_NS), "") for c in classes if str(c).startswith(str(self.TIME_NS))]
+        entities += [str(c).replace(str(self.GEOSPATIAL_NS), "") for c in classes if str(c).startswith(str(self.GEOSPATIAL_NS))]
+
+        relations = set(self.g.subjects(RDF.type, OWL.ObjectProperty))
+        relations_list = [str(r).replace(str(self.MY_NS), "") for r in relations if str(r).startswith(str(self.MY_NS))]
+        relations_list += [str(r).replace(str(self.TIME_NS), "") for r in relations if str(r).startswith(str(self.TIME_NS))]
+        relations_list += [str(r).replace(str(self.GEOSPATIAL_NS), "") for r in relations if str(r).startswith(str(self.GEOSPATIAL_NS))]
+
+        return entities, relations_list
+
+    def get_or_create_instance(self, instance_name, class_name=None):
+        instance_uri = self.existing_instances.get(instance_name)
+
+        if instance_uri:
+            return instance_uri
+
+        instance_uri = self.new_instance_uri(instance_name, class_name)
+        self.existing_instances[instance_name] = instance_uri
+        return instance_uri
+
+    def new_instance_uri(self, instance_name, class_name=None):
+        instance_identifier = self.id_allocator.allocate(instance_name)
+        instance_uri = URIRef(self.MY_NS + instance_identifier)
+
+        if class_name:
+            self.scene_graph.add((instance_uri, RDF.type, OWL.NamedIndividual))
+            self.scene_graph.add((instance_uri, RDF.type, self.MY_NS[class_name]))
+
+        return instance_uri
+
+    def parse_scene_description(self, scene_description):
+        # Parse once; analysis and generation both accept the ParsedDescription instead of the text
+        if isinstance(scene_description, ParsedDescription):
+            return scene_description
+        parsed = self.description_parser.parse(scene_description)
+        for line_number, line, reason in parsed.errors:
+            print(f"Skipping scene description line {line_number} ({reason}): {line}")
+        return parsed
+
+    @timed("analyze_scene_description")
+    def analyze_scene_description(self, scene_description):
+        parsed = self.parse_scene_description(scene_description)
+
+        # Each distinct class and relation is checked once, however often it occurs
+        new_classes = {class_name for class_name in parsed.class_names() if not self.class_exists(class_name)}
+        new_relations = {property_name for property_name in parsed.predicates if not self.relation_exists(property_name)}
+
+        return new_classes, new_relations
+
+    def class_exists(self, class_name):
+        return self.vocabulary.has_class(URIRef(self.MY_NS + class_name))
+
+    def add_new_class(self, class_name):
+        class_uri = URIRef(self.MY_NS + class_name)
+        if not self.vocabulary.has_class(class_uri):
+            self.add_schema_triple((class_uri, RDF.type, OWL.Class))
+            metrics.increment("classes_created")
+            self.log(f"Added new class: {class_name}")
+        else:
+            self.copy_schema_additions(class_uri)
+        return class_uri
+
+    def relation_exists(self, relation_name):
+        return self.vocabulary.has_relation(URIRef(self.MY_NS + relation_name))
+
+    def add_new_relation(self, relation_name):
+        relation_uri = URIRef(self.MY_NS + relation_name)
+        if not self.vocabulary.has_relation(relation_uri):
+            self.add_schema_triple((relation_uri, RDF.type, OWL.ObjectProperty))
+            metrics.increment("relations_created")
+            self.log(f"Added new relation: {relation_name}")
+        else:
+            self.copy_schema_additions(relation_uri)
+        return relation_uri
+
+    def sensor_quads(self, instance_name, class_name, created_instances=None):
+        # Expand the sensor class's precompiled template; unknown classes just get a typed instance
+        instance_identifier = self.id_allocator.allocate(instance_name)
+        instance_uri = URIRef(self.MY_NS + instance_identifier)
+        metrics.increment("sensors_instantiated")
+        template = self.sensor_templates.get(class_name)
+        if template is None:
+            quads = [(instance_uri, RDF.type, OWL.NamedIndividual, self.scene_graph),
+                     (instance_uri, RDF.type, self.MY_NS[class_name], self.scene_graph)]
+            return instance_uri, quads
+        quads, property_instance_uris = template.quads(instance_uri, instance_identifier, self.scene_graph)
+        if created_instances is not None:
+            # Keep track of the created instances
+            created_instances.update(property_instance_uris)
+        return instance_uri, quads
+
+    def create_sensor_instance(self, instance_name, class_name=None, created_instances=None):
+        if not class_name:
+            return self.new_instance_uri(instance_name)
+        instance_uri, quads = self.sensor_quads(instance_name, class_name, created_instances)
+        self.scene_graph.addN(quads)
+        return instance_uri
+
+    def installed_sensor_quads(self, subject_instance_uri, instance_name, class_name):
+        sensor_instance_uri, quads = self.sensor_quads(instance_name, class_name)
+        quads.append((sensor_instance_uri, self.MY_NS["isInstalledOn"], subject_instance_uri, self.scene_graph))
+        quads.append((subject_instance_uri, self.MY_NS["hasSensor"], sensor_instance_uri, self.scene_graph))
+        return quads
+
+    @timed("create_instance_with_sensor")
+    def create_instance_with_sensor(self, subject_instance_uri, subject_class_name):
+        # All sensors of the subject are collected first and inserted with a single addN call
+        quads = []
+        if self.is_kind_of(subject_class_name, "TwoWheeledVehicle"):
+            # Check if a bicycle sensor instance for this subject instance has already been created
+            if subject_instance_uri not in self.bicycle_sensor_instances_created:
+                quads += self.installed_sensor_quads(subject_instance_uri, "BicSensor", "BicycleSensor")
+                # Keep track of the created bicycle sensor instances
+                self.bicycle_sensor_instances_created.add(subject_instance_uri)
+                quads += self.sensor_quads("EnvSensor", "EnvironmentalSensor")[1]
+
+        if subject_class_name == "Rider":
+            phone_sensor_instance_uri, phone_quads = self.sensor_quads("SmartPhoneSensor", "SmartPhoneSensor")
+            quads += phone_quads
+            quads.append((subject_instance_uri, self.MY_NS["hasSensor"], phone_sensor_instance_uri, self.scene_graph))
+
+        if self.is_kind_of(subject_class_name, "FourWheeledVehicle"):
+            # Check if a vehicle sensor instance for this subject instance has already been created
+            if subject_instance_uri not in self.vehicle_sensor_instances_created:
+                quads += self.installed_sensor_quads(subject_instance_uri, "VehSensor", "VehicleSensor")
+                # Keep track of the created vehicle sensor instances
+                self.vehicle_sensor_instances_created.add(subject_instance_uri)
+                quads += self.sensor_quads("EnvSensor", "EnvironmentalSensor")[1]
+
+        if quads:
+            self.scene_graph.addN(quads)
+
+    def add_time_instant(self, instance_name, timestamp, position_name=None):
+        # A time:Instant at timestamp seconds, e.g. a video frame or the start of an observation window
+        instant_uri = self.get_or_create_instance(instance_name, None)
+        position_uri = self.get_or_create_instance(position_name or f"{instance_name}Position", None)
+        self.scene_graph.add((instant_uri, RDF.type, self.TIME_NS["Instant"]))
+        self.scene_graph.add((instant_uri, self.TIME_NS["inTimePosition"], position_uri))
+        self.scene_graph.add((position_uri, RDF.type, self.TIME_NS["TimePosition"]))
+        self.scene_graph.add((position_uri, self.TIME_NS["numericPosition"], Literal(round(timestamp, 3), datatype=XSD.decimal)))
+        self.scene_graph.add((position_uri, self.TIME_NS["unitType"], self.TIME_NS["unitSecond"]))
+        return instant_uri
+
+    def create_scene_instance(self):
+        # Create an instance of "Scene" with a unique ID
+        scene_instance_uri = self.new_instance_uri("Scene", "Scene")
+        if self.current_scene.scene_instance_uri is None:
+            self.current_scene.scene_instance_uri = scene_instance_uri
+        return scene_instance_uri
+
+    def add_scene_participant(self, scene_instance_uri, instance_uri):
+        self.scene_graph.add((instance_uri, self.MY_NS["isAParticipantOfScene"], scene_instance_uri))
+        self.scene_graph.add((scene_instance_uri, self.MY_NS["includes"], instance_uri))
+
+    @timed("generate_instance_from_scene_description")
+    def generate_instance_from_scene_description(self, scene_description):
+        triples_before = len(self.scene_graph) if metrics.enabled else 0
+        parsed = self.parse_scene_description(scene_description)
+
+        scene_instance_uri = self.create_scene_instance()
+
+        # Create instances for subjects and objects
+        for subject in parsed.subjects:
+            subject_class_name = parsed.class_of[subject]
+            self.add_new_class(subject_class_name)  # No-op for known classes
+            subject_instance_uri = self.get_or_create_instance(subject, subject_class_name)
+            self.create_instance_with_sensor(subject_instance_uri, subject_class_name)
+            if self.is_participant_class(subject_class_name):
+                # Relate subject to the scene
+                self.add_scene_participant(scene_instance_uri, subject_instance_uri)
+                self.log(f"Created Scene Relation for Subject")
+
+        for obj in parsed.objects:
+            obj_class_name = parsed.class_of[obj]
+            self.add_new_class(obj_class_name)
+            obj_instance_uri = self.get_or_create_instance(obj, obj_class_name)
+            if self.is_participant_class(obj_class_name):
+                # Relate subject to the scene
+                self.add_scene_participant(scene_instance_uri, obj_instance_uri)
+                self.log(f"Created Scene Relation for Subject")
+
+        # Add relations based on the parsed triples; each distinct predicate is resolved once
+        property_uris = {predicate: self.add_new_relation(predicate) for predicate in parsed.predicates}
+        for subject, predicate, obj in parsed.triples:
+            subject_instance_uri = self.existing_instances[subject]
+            obj_instance_uri = self.existing_instances[obj]
+            property_uri = property_uris[predicate]
+            self.scene_graph.add((subject_instance_uri, property_uri, obj_instance_uri))
+            self.log(f"Created relation: {subject} {predicate} {obj}")
+
+        if metrics.enabled:
+            metrics.increment("triples_added", len(self.scene_graph) - triples_before)
+        return scene_instance_uri
+
+    @timed("serialize_graph")
+    def serialize_graph(self, destination, format="xml"):
+        # Serialize and save the graph
+        self.g.serialize(destination=destination, format=format)
@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from BatchPipeline import OUTPUT_EXTENSIONS, SceneRecord, generate_scene, init_worker
+from DetectionEngine import DetectionEngine, decode_image_bytes
+from SceneDescriptionParser import SceneDescriptionParser
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+CONTENT_TYPES = {"turtle": "text/turtle", "nt": "application/n-triples", "xml": "application/rdf+xml"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def warm_up_worker():
+    # Submitted once per worker at startup so the ontology is loaded before the first request arrives
+    return True
+
+
+class SceneGraphService:
+    """HTTP front end: POST /scene-graph with {"description": ..., "image": <base64>} returns the scene graph.
+
+    Requests are admitted up to max_pending; beyond that the service answers 503 so callers back off.
+    Admitted requests are grouped into batches: images of a batch go through YOLO together on a detection
+    thread, then each scene is built in a process pool that holds a warm copy of the ontology.
+    """
+
+    def __init__(self, ontology_path="ravdKGMerged1.owl", workers=2, max_pending=256, batch_size=16,
+                 batch_delay=0.01, detection_engine=None, seed=None, id_scheme="counter"):
+        self.ontology_path = ontology_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.detection_engine = detection_engine
+        self.seed = seed if seed is not None else uuid.uuid4().hex
+        self.id_scheme = id_scheme
+        self.pending = 0
+        # Descriptions are checked here so malformed ones are reported to the client rather than skipped silently
+        self.description_parser = SceneDescriptionParser()
+        self.queue = None
+        self.pool = None
+        self.detect_executor = None
+        self.batch_task = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        loop = asyncio.get_running_loop()
+        # Load the ontology in the parent first so forked workers inherit it
+        init_worker(self.ontology_path, self.seed, self.id_scheme)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                        initargs=(self.ontology_path, self.seed, self.id_scheme))
+        await asyncio.gather(*(loop.run_in_executor(self.pool, warm_up_worker) for _ in range(self.workers)))
+        self.detect_executor = ThreadPoolExecutor(max_workers=1)
+        if self.detection_engine is not None:
+            await loop.run_in_executor(self.detect_executor, self.detection_engine.load_model)
+
+        self.queue = asyncio.Queue(self.max_pending)
+        self.batch_task = asyncio.create_task(self.batch_loop())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving scene graphs on http://{host}:{port} with {self.workers} workers")
+        return server
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.detect_executor is not None:
+            self.detect_executor.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            try:
+                method, path, body = await self.read_request(reader)
+                status, content_type, payload, extra_headers = await self.dispatch(method, path, body)
+            except HttpError as e:
+                status, content_type, payload = e.status, "application/json", json.dumps({"error": str(e)}).encode()
+                extra_headers = []
+            except Exception as e:
+                status, content_type, payload = 500, "application/json", json.dumps({"error": str(e)}).encode()
+                extra_headers = []
+            headers = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                       f"Content-Length: {len(payload)}", "Connection: close"] + extra_headers
+            if status == 503:
+                headers.append("Retry-After: 1")
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            raise HttpError(400, "Empty request")
+        try:
+            method, path, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        content_length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    content_length = int(value.strip())
+                except ValueError:
+                    raise HttpError(400, "Invalid Content-Length")
+                if content_length < 0:
+                    raise HttpError(400, "Invalid Content-Length")
+        if content_length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(content_length) if content_length else b""
+        return method, path, body
+
+    async def dispatch(self, method, path, body):
+        if path == "/health":
+            stats = {"pending": self.pending, "max_pending": self.max_pending, "workers": self.workers}
+            return 200, "application/json", json.dumps(stats).encode(), []
+        if path != "/scene-graph":
+            raise HttpError(404, f"Unknown path {path}")
+        if method != "POST":
+            raise HttpError(405, "Use POST")
+
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"Invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+        output_format = request.get("format", "turtle")
+        if not isinstance(output_format, str) or output_format not in OUTPUT_EXTENSIONS:
+            raise HttpError(400, f"Unsupported format {output_format}")
+        image_bytes = None
+        if request.get("image"):
+            if self.detection_engine is None:
+                raise HttpError(400, "Detection is not enabled on this server")
+            try:
+                image_bytes = base64.b64decode(request["image"], validate=True)
+            except (binascii.Error, TypeError, ValueError) as e:
+                raise HttpError(400, f"Invalid base64 image: {e}")
+        description = request.get("description", "")
+        if not isinstance(description, str):
+            raise HttpError(400, "description must be a string")
+        if not description and image_bytes is None:
+            raise HttpError(400, "Provide a description, an image, or both")
+        skipped_lines = []
+        if description:
+            parsed = self.description_parser.parse(description)
+            if parsed.errors and not parsed.triples and image_bytes is None:
+                errors = "; ".join(f"line {line_number}: {reason}" for line_number, _, reason in parsed.errors)
+                raise HttpError(400, f"No valid triples in description ({errors})")
+            skipped_lines = [str(line_number) for line_number, _, _ in parsed.errors]
+
+        # Backpressure: refuse work beyond the admission limit instead of queueing without bound
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "Server is busy, retry later")
+        self.pending += 1
+        try:
+            record = SceneRecord(uuid.uuid4().hex, None, description)
+            future = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((record, image_bytes, output_format, future))
+            scene_instance_uri, data = await future
+        finally:
+            self.pending -= 1
+        # Malformed lines are skipped like in the batch pipeline, and reported so the client can tell
+        extra_headers = [f"X-Skipped-Lines: {', '.join(skipped_lines)}"] if skipped_lines else []
+        return 200, CONTENT_TYPES[output_format], data.encode("utf-8"), extra_headers
+
+    async def next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.attach_detections(loop, await self.next_batch())
+            # Scenes are built concurrently in the pool; the loop goes straight back to batching
+            for record, _, output_format, future in batch:
+                task = loop.run_in_executor(self.pool, generate_scene, record, output_format, False)
+                task.add_done_callback(lambda done, future=future: self.resolve(done, future))
+
+    async def attach_detections(self, loop, batch):
+        # All images of the batch go through YOLO in one predict call on the detection thread
+        images = [image_bytes for _, image_bytes, _, _ in batch if image_bytes is not None]
+        if not images:
+            return batch
+        try:
+            boxes_per_image = iter(await loop.run_in_executor(self.detect_executor, self.detect_batch, images))
+        except Exception as e:
+            # The model itself failed: a server fault, not the client's
+            boxes_per_image = iter([HttpError(500, f"Detection failed: {e}")] * len(images))
+
+        attached = []
+        for record, image_bytes, output_format, future in batch:
+            if image_bytes is not None:
+                boxes = next(boxes_per_image)
+                if isinstance(boxes, HttpError):
+                    future.set_exception(boxes)
+                    continue
+                record = record._replace(boxes=boxes)
+            attached.append((record, image_bytes, output_format, future))
+        return attached
+
+    def detect_batch(self, images):
+        decoded = []
+        digests = []
+        for image_bytes in images:
+            try:
+                decoded.append(decode_image_bytes(image_bytes))
+                digests.append(hashlib.sha256(image_bytes).hexdigest())
+            except ValueError as e:
+                # Bytes that are not an image are the client's error
+                decoded.append(HttpError(400, str(e)))
+        valid_images = [image for image in decoded if not isinstance(image, HttpError)]
+        boxes_per_image = iter(self.detection_engine.predict_cached(valid_images, digests) if valid_images else [])
+        return [image if isinstance(image, HttpError) else next(boxes_per_image) for image in decoded]
+
+    @staticmethod
+    def resolve(done, future):
+        if future.done():
+            return
+        if done.exception() is not None:
+            future.set_exception(done.exception())
+            return
+        record_id, scene_instance_uri, data, _, error = done.result()
+        if error is not None:
+            # Descriptions and images were validated before queueing, so what fails here is on the server
+            future.set_exception(HttpError(500, error))
+        else:
+            future.set_result((scene_instance_uri, data))
+
+
+async def serve(service, host, port):
+    server = await service.start(host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve scene graph generation over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    parser.add_argument("--workers", type=int, default=2, help="Scene-building worker processes")
+    parser.add_argument("--max-pending", type=int, default=256, help="Requests admitted before answering 503")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batch-delay", type=float, default=0.01, help="Seconds to wait while filling a batch")
+    parser.add_argument("--detect", action="store_true", help="Accept base64 images and run YOLO on them")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--detection-cache", help="Reuse detections of previously seen images from this directory")
+    args = parser.parse_args()
+
+    detection_engine = None
+    if args.detect:
+        from DetectionCache import DetectionCache
+        cache = DetectionCache(args.detection_cache) if args.detection_cache else None
+        detection_engine = DetectionEngine(args.model, batch_size=args.batch_size, cache=cache)
+    service = SceneGraphService(args.ontology, args.workers, args.max_pending, args.batch_size, args.batch_delay,
+                                detection_engine)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
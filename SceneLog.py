@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+
+from rdflib import Dataset
+
+from OntologySnapshot import load_ontology
+from SceneGraphGenerator import SceneGraphGenerator
+
+
+class SceneLog:
+    """Append-only N-Quads log holding one named graph per generated scene."""
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+
+    def append_ntriples(self, ntriples, graph_name):
+        # Turn each N-Triples line "s p o ." into the quad "s p o <graph> ."
+        suffix = f" <{graph_name}> .\n"
+        lines = [line[:-1].rstrip() + suffix for line in ntriples.splitlines() if line.endswith(".")]
+        if not lines:
+            return 0
+        # One write per scene, so a crash can at worst truncate the final scene
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        return len(lines)
+
+    def append(self, scene_graph, graph_name):
+        return self.append_ntriples(scene_graph.serialize(format="nt"), graph_name)
+
+
+def compact(log_path, destination, ontology_path="ravdKGMerged1.owl", format="xml"):
+    """Merge the base ontology and every scene graph in the log into a single ontology file."""
+    g = load_ontology(ontology_path)
+    SceneGraphGenerator.bind_namespaces(g)
+    scenes = Dataset()
+    scenes.parse(log_path, format="nquads")
+    scene_count = 0
+    for context in scenes.graphs():
+        if context.identifier == scenes.default_graph.identifier:
+            continue
+        g.addN((s, p, o, g) for s, p, o in context)
+        scene_count += 1
+    g.serialize(destination=destination, format=format)
+    return scene_count, len(g)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the append-only scene graph log")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Write the ontology plus all logged scenes as one file")
+    compact_parser.add_argument("log")
+    compact_parser.add_argument("destination")
+    compact_parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    compact_parser.add_argument("--format", default="xml")
+
+    args = parser.parse_args()
+    if args.command == "compact":
+        start = time.perf_counter()
+        scene_count, triple_count = compact(args.log, args.destination, args.ontology, args.format)
+        print(f"Compacted {scene_count} scenes into {args.destination} ({triple_count} triples) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
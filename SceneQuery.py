@@ -0,0 +1,186 @@
+import argparse
+import time
+
+from rdflib import Dataset, RDF, OWL, URIRef
+
+from SceneGraphGenerator import SceneGraphGenerator
+
+MY_NS = SceneGraphGenerator.MY_NS
+PARTICIPANT_OF = MY_NS["isAParticipantOfScene"]
+INCLUDES = MY_NS["includes"]
+HAS_SENSOR = MY_NS["hasSensor"]
+NO_INSTANCES = frozenset()
+STATEMENT_PARTS = (RDF.subject, RDF.predicate, RDF.object)
+
+
+class SceneIndex:
+    """In-memory secondary indexes over generated scene instances.
+
+    Instances are indexed by class, by scene (isAParticipantOfScene/includes, or the named graph a scene was
+    logged under), by sensor (hasSensor, both ways) and by relation predicate in both directions; relations
+    recorded as time-stamped rdf:Statements (tracked video objects) are indexed like plain triples. Each typed
+    instance is also filed under every ancestor of its class (the generator's precomputed ancestors_of), so a
+    query for FourWheeledVehicle finds Cars and Jeeps with a single lookup. Returned sets are the live index;
+    copy them before modifying.
+    """
+
+    def __init__(self, ancestors_of=None):
+        self.ancestors_of = ancestors_of or {}
+        self.instances_by_class = {}
+        self.instances_by_superclass = {}  # class -> instances of it and of all its subclasses
+        self.scenes_of = {}
+        self.instances_by_scene = {}
+        self.sensors_of = {}  # host instance -> sensors installed on it
+        self.hosts_of_sensor = {}  # sensor -> instances it is installed on
+        self.objects_by_predicate = {}  # predicate -> subject -> objects
+        self.subjects_by_predicate = {}  # predicate -> object -> subjects
+        self.statement_parts = {}  # rdf:Statement -> its subject/predicate/object seen so far
+
+    @staticmethod
+    def resolve(name):
+        return name if isinstance(name, URIRef) else MY_NS[name]
+
+    def add_to_scene(self, instance_uri, scene_uri):
+        self.scenes_of.setdefault(instance_uri, set()).add(scene_uri)
+        self.instances_by_scene.setdefault(scene_uri, set()).add(instance_uri)
+
+    def add_relation(self, s, p, o):
+        self.objects_by_predicate.setdefault(p, {}).setdefault(s, set()).add(o)
+        self.subjects_by_predicate.setdefault(p, {}).setdefault(o, set()).add(s)
+
+    def add_statement_part(self, statement, part, value):
+        # The parts of a reified statement may arrive in any order; index the relation once all three are known
+        parts = self.statement_parts.setdefault(statement, {})
+        parts[part] = value
+        if len(parts) == len(STATEMENT_PARTS):
+            del self.statement_parts[statement]
+            self.add_relation(parts[RDF.subject], parts[RDF.predicate], parts[RDF.object])
+
+    def add_triple(self, s, p, o, scene_uri=None):
+        if p in STATEMENT_PARTS:
+            self.add_statement_part(s, p, o)
+            return
+        if p == RDF.type:
+            if o == RDF.Statement:
+                return
+            if o != OWL.NamedIndividual:
+                self.instances_by_class.setdefault(o, set()).add(s)
+                self.instances_by_superclass.setdefault(o, set()).add(s)
+                for ancestor_uri in self.ancestors_of.get(o, ()):
+                    self.instances_by_superclass.setdefault(ancestor_uri, set()).add(s)
+            if scene_uri is not None and s != scene_uri:
+                self.add_to_scene(s, scene_uri)
+        elif p == PARTICIPANT_OF:
+            self.add_to_scene(s, o)
+        elif p == INCLUDES:
+            self.add_to_scene(o, s)
+        elif p == HAS_SENSOR:
+            self.sensors_of.setdefault(s, set()).add(o)
+            self.hosts_of_sensor.setdefault(o, set()).add(s)
+        if isinstance(o, URIRef) and p != RDF.type:
+            self.add_relation(s, p, o)
+
+    def add_graph(self, graph, scene_uri=None):
+        # scene_uri (e.g. the named graph of a logged scene) places every typed instance of the graph in that scene
+        for s, p, o in graph:
+            self.add_triple(s, p, o, scene_uri)
+
+    @classmethod
+    def from_scene_log(cls, log_path, ancestors_of=None):
+        index = cls(ancestors_of)
+        scenes = Dataset()
+        scenes.parse(log_path, format="nquads")
+        for context in scenes.graphs():
+            if context.identifier != scenes.default_graph.identifier:
+                index.add_graph(context, context.identifier)
+        return index
+
+    def instances_of(self, class_name, include_subclasses=True):
+        instances = self.instances_by_superclass if include_subclasses else self.instances_by_class
+        return instances.get(self.resolve(class_name), NO_INSTANCES)
+
+    def scenes_with(self, class_name):
+        scenes = set()
+        for instance_uri in self.instances_of(class_name):
+            scenes |= self.scenes_of.get(instance_uri, NO_INSTANCES)
+        return scenes
+
+    def related(self, subject_class, predicate, object_class):
+        # (subject, object) pairs linked by predicate, starting from whichever side is smaller
+        predicate_uri = self.resolve(predicate)
+        subjects = self.instances_of(subject_class)
+        objects = self.instances_of(object_class)
+        pairs = []
+        # Set intersections (in C) first narrow the side to only instances that have the predicate at all
+        if len(subjects) <= len(objects):
+            objects_of = self.objects_by_predicate.get(predicate_uri, {})
+            for subject_uri in subjects.intersection(objects_of):
+                pairs.extend((subject_uri, object_uri) for object_uri in objects_of[subject_uri] & objects)
+        else:
+            subjects_of = self.subjects_by_predicate.get(predicate_uri, {})
+            for object_uri in objects.intersection(subjects_of):
+                pairs.extend((subject_uri, object_uri) for subject_uri in subjects_of[object_uri] & subjects)
+        return pairs
+
+    def scenes_with_relation(self, subject_class, predicate, object_class):
+        """Scenes in which an instance of subject_class is related by predicate to one of object_class."""
+        scenes = set()
+        for subject_uri, object_uri in self.related(subject_class, predicate, object_class):
+            scenes |= self.scenes_of.get(subject_uri, NO_INSTANCES) & self.scenes_of.get(object_uri, NO_INSTANCES)
+        return scenes
+
+    def sensors_on(self, instance_uri, sensor_class=None):
+        sensors = self.sensors_of.get(instance_uri, NO_INSTANCES)
+        if sensor_class is not None:
+            sensors = sensors & self.instances_of(sensor_class)
+        return sensors
+
+    def scenes_with_sensor(self, sensor_class):
+        # Sensor class -> its instances -> the instances they are installed on -> their scenes
+        scenes = set()
+        for sensor_uri in self.instances_of(sensor_class):
+            for host_uri in self.hosts_of_sensor.get(sensor_uri, NO_INSTANCES):
+                scenes |= self.scenes_of.get(host_uri, NO_INSTANCES)
+        return scenes
+
+    def __len__(self):
+        return len(self.instances_by_scene)
+
+
+def relation_query_sparql(subject_class, predicate, object_class):
+    # The SPARQL equivalent of SceneIndex.scenes_with_relation, for comparison
+    return f"""
+        PREFIX my: <{MY_NS}>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        SELECT DISTINCT ?scene WHERE {{
+            ?subject my:{predicate} ?object .
+            ?subject a/rdfs:subClassOf* my:{subject_class} .
+            ?object a/rdfs:subClassOf* my:{object_class} .
+            ?subject my:isAParticipantOfScene ?scene .
+            ?object my:isAParticipantOfScene ?scene .
+        }}"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query logged scene graphs through secondary indexes")
+    parser.add_argument("log", help="N-Quads scene log (see SceneLog.py)")
+    parser.add_argument("subject_class", help="e.g. Rider")
+    parser.add_argument("predicate", help="e.g. isNear")
+    parser.add_argument("object_class", help="e.g. FourWheeledVehicle")
+    parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    args = parser.parse_args()
+
+    generator = SceneGraphGenerator(args.ontology, verbose=False)
+    start = time.perf_counter()
+    index = SceneIndex.from_scene_log(args.log, generator.ancestors_of)
+    print(f"Indexed {len(index)} scenes in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    scenes = index.scenes_with_relation(args.subject_class, args.predicate, args.object_class)
+    elapsed = time.perf_counter() - start
+    for scene_uri in sorted(scenes):
+        print(scene_uri)
+    print(f"{len(scenes)} scenes in {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
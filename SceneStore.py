@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+
+class SceneStore:
+    """Keeps a bounded number of scenes resident, flushing them to the scene log before they are dropped.
+
+    Every scene is built in its own graph by the generator. Closed scenes are flushed right away but stay
+    resident (for review or rework) until more than max_resident_scenes are held; the least recently used
+    scene is then evicted so a long-running process does not grow without bound.
+    """
+
+    def __init__(self, generator, scene_log, max_resident_scenes=8):
+        self.generator = generator
+        self.scene_log = scene_log
+        self.max_resident_scenes = max(1, max_resident_scenes)
+        self.scenes = OrderedDict()
+        self.flushed = set()
+        self.scene_counter = 0
+
+    def open_scene(self, scene_id=None):
+        if scene_id is None:
+            self.scene_counter += 1
+            scene_id = f"scene{self.scene_counter}"
+        self.generator.begin_scene(scene_id)
+        scene_state = self.generator.current_scene
+        self.scenes[scene_id] = scene_state
+        self.evict()
+        return scene_state
+
+    def get(self, scene_id):
+        # Return a resident scene and make it the generator's working scene again
+        scene_state = self.scenes[scene_id]
+        self.scenes.move_to_end(scene_id)
+        self.generator.activate_scene(scene_state)
+        self.flushed.discard(scene_id)  # It may change again, so flush it anew on close or eviction
+        return scene_state
+
+    def flush(self, scene_id):
+        scene_state = self.scenes[scene_id]
+        if scene_id not in self.flushed and len(scene_state.graph):
+            graph_name = scene_state.scene_instance_uri or self.generator.MY_NS[scene_id]
+            self.scene_log.append(scene_state.graph, graph_name)
+        self.flushed.add(scene_id)
+
+    def close_scene(self, scene_id):
+        self.flush(scene_id)
+        self.evict()
+
+    def discard(self, scene_id):
+        # Drop a scene without logging it, e.g. when its processing was cancelled half way
+        self.scenes.pop(scene_id, None)
+        self.flushed.discard(scene_id)
+
+    def evict(self):
+        while len(self.scenes) > self.max_resident_scenes:
+            scene_id = next(iter(self.scenes))
+            self.flush(scene_id)
+            del self.scenes[scene_id]
+            self.flushed.discard(scene_id)
+
+    def flush_all(self):
+        for scene_id in list(self.scenes):
+            self.flush(scene_id)
+
+    def __len__(self):
+        return len(self.scenes)
+
+    def __contains__(self, scene_id):
+        return scene_id in self.scenes
@@ -0,0 +1,54 @@
+from rdflib import OWL, RDF, RDFS, URIRef
+
+# Observable properties instantiated for each sensor class when the ontology does not declare them
+SENSOR_OBSERVABLE_PROPERTIES = {
+    "BicycleSensor": ["Latitude", "Longitude", "BicycleBrakesCondition", "Speed", "ProximityToClosestVehicle", "ProximityToClosestPedestrian"],
+    "VehicleSensor": ["Latitude", "Longitude", "DoorLockStatus", "Acceleration", "Speed", "ProximityToClosestVehicle", "ProximityToClosestPedestrian"],
+    "EnvironmentalSensor": ["Temperature", "Humidity", "WindSpeed", "AtmosphericPressure"],
+    "SmartPhoneSensor": ["RespiratoryRate", "HeartRate"],
+}
+
+
+class SensorTemplate:
+    """A sensor class precompiled into the triples that instantiate it and its observable properties."""
+
+    def __init__(self, namespace, class_name, property_names):
+        self.namespace = namespace
+        self.class_uri = namespace[class_name]
+        self.observes_uri = namespace["observes"]
+        self.observed_by_uri = namespace["observedBy"]
+        self.properties = [(property_name, namespace[property_name]) for property_name in property_names]
+
+    def quads(self, sensor_uri, sensor_identifier, graph):
+        # Property instances are named after their sensor, so one allocated id covers the whole sensor
+        quads = [(sensor_uri, RDF.type, OWL.NamedIndividual, graph), (sensor_uri, RDF.type, self.class_uri, graph)]
+        property_uris = []
+        for property_name, property_class_uri in self.properties:
+            property_uri = URIRef(self.namespace + f"{property_name}_{sensor_identifier}")
+            quads.append((property_uri, RDF.type, property_class_uri, graph))
+            quads.append((sensor_uri, self.observes_uri, property_uri, graph))
+            quads.append((property_uri, self.observed_by_uri, sensor_uri, graph))
+            property_uris.append(property_uri)
+        return quads, property_uris
+
+
+def ontology_observable_properties(g, namespace):
+    # Sensor classes may declare "subClassOf (observes some/only X)" restrictions; those win over the table
+    observes_uri = namespace["observes"]
+    declared = {}
+    for restriction in g.subjects(OWL.onProperty, observes_uri):
+        observed_class = g.value(restriction, OWL.someValuesFrom) or g.value(restriction, OWL.allValuesFrom)
+        if not isinstance(observed_class, URIRef) or not str(observed_class).startswith(str(namespace)):
+            continue
+        for sensor_class in g.subjects(RDFS.subClassOf, restriction):
+            if isinstance(sensor_class, URIRef) and str(sensor_class).startswith(str(namespace)):
+                sensor_name = str(sensor_class)[len(namespace):]
+                declared.setdefault(sensor_name, []).append(str(observed_class)[len(namespace):])
+    return declared
+
+
+def load_sensor_templates(g, namespace):
+    property_table = dict(SENSOR_OBSERVABLE_PROPERTIES)
+    property_table.update(ontology_observable_properties(g, namespace))
+    return {class_name: SensorTemplate(namespace, class_name, property_names)
+            for class_name, property_names in property_table.items()}
@@ -0,0 +1,177 @@
+import argparse
+import os
+import time
+from collections import deque
+
+from rdflib import RDF
+
+from DetectionBridge import add_detection_triples
+from DetectionEngine import DetectionEngine
+from ObjectTracker import ObjectTracker
+from SceneGraphGenerator import SceneGraphGenerator
+from SceneLog import SceneLog
+
+
+def iter_frames(video_path, stride=1, max_frames=None):
+    """Yield (frame_index, timestamp_seconds, frame) for every stride-th frame of a video."""
+    import cv2
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {video_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    try:
+        frame_index = 0
+        sampled = 0
+        while max_frames is None or sampled < max_frames:
+            # grab() skips a frame without decoding it; only sampled frames are retrieved
+            if not capture.grab():
+                break
+            if frame_index % stride == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield frame_index, frame_index / fps, frame
+                sampled += 1
+            frame_index += 1
+    finally:
+        capture.release()
+
+
+def iter_frame_detections(engine, frames, on_detection=None):
+    # The engine yields detections in input order, so frame metadata can be matched up with a FIFO
+    # on_detection(frame_index, detection) sees each frame while its image is still available
+    metadata = deque()
+
+    def frame_sources():
+        for frame_index, timestamp, frame in frames:
+            metadata.append((frame_index, timestamp))
+            yield frame
+
+    for detection in engine.detect(frame_sources()):
+        frame_index, timestamp = metadata.popleft()
+        if on_detection is not None:
+            on_detection(frame_index, detection)
+        yield frame_index, timestamp, detection.boxes
+
+
+def build_window_scene(generator, window, previous_interval_uri=None, conf=0.5, scene_id=None, tracker=None,
+                       track_instances=None):
+    """Build one scene graph for a window of (frame_index, timestamp, boxes) detections.
+
+    With a tracker, each tracked object is one instance (with one set of sensors) and every frame only adds
+    its time-stamped observations: hasTime to the frame's instant, and its spatial relations as rdf:Statements
+    with time:hasTime. Pass the same tracker and track_instances dict for every window of a video to keep
+    that instance across windows: only the window that first sees a track declares its type and sensors,
+    later windows link it to their scene as a participant.
+    """
+    time_ns = generator.TIME_NS
+    if tracker is not None and track_instances is None:
+        track_instances = {}
+    scene_graph = generator.begin_scene(scene_id)
+    scene_instance_uri = generator.create_scene_instance()
+
+    first_frame, last_frame = window[0][0], window[-1][0]
+    interval_uri = generator.get_or_create_instance(f"FrameWindow{first_frame}_{last_frame}", None)
+    scene_graph.add((interval_uri, RDF.type, time_ns["ProperInterval"]))
+    scene_graph.add((scene_instance_uri, time_ns["hasTime"], interval_uri))
+    if previous_interval_uri is not None:
+        scene_graph.add((previous_interval_uri, time_ns["intervalMeets"], interval_uri))
+
+    previous_instant_uri = None
+    for frame_index, timestamp, boxes in window:
+        instant_uri = generator.add_time_instant(f"Frame{frame_index}", timestamp, f"FramePosition{frame_index}")
+        if previous_instant_uri is None:
+            scene_graph.add((interval_uri, time_ns["hasBeginning"], instant_uri))
+        else:
+            scene_graph.add((previous_instant_uri, time_ns["before"], instant_uri))
+        previous_instant_uri = instant_uri
+
+        created = add_detection_triples(generator, scene_instance_uri, boxes, conf, f"F{frame_index}", tracker=tracker,
+                                        instant_uri=instant_uri if tracker is not None else None,
+                                        track_instances=track_instances)
+        for instance_uri, _ in created:
+            scene_graph.add((instance_uri, time_ns["hasTime"], instant_uri))
+    scene_graph.add((interval_uri, time_ns["hasEnd"], previous_instant_uri))
+    if tracker is not None:
+        # Dropped tracks never come back, so their instances need not be remembered
+        for track_id in track_instances.keys() - set(tracker.track_ids.tolist()):
+            del track_instances[track_id]
+    return scene_graph, interval_uri
+
+
+def iter_video_scene_graphs(generator, engine, video_path, stride=1, window_size=10, max_frames=None, conf=0.5,
+                            on_detection=None, track=True):
+    """Yield (window_index, scene_graph) per window; only the current window's boxes are held in memory."""
+    # Tracks and their instances carry over between windows, so an object is one instance for the whole video
+    tracker = ObjectTracker() if track else None
+    track_instances = {}
+    window = []
+    window_index = 0
+    previous_interval_uri = None
+    for frame_detection in iter_frame_detections(engine, iter_frames(video_path, stride, max_frames), on_detection):
+        window.append(frame_detection)
+        if len(window) >= window_size:
+            scene_graph, previous_interval_uri = build_window_scene(generator, window, previous_interval_uri, conf,
+                                                                    f"{video_path}#{window_index}", tracker,
+                                                                    track_instances)
+            yield window_index, scene_graph
+            window = []
+            window_index += 1
+    if window:
+        scene_graph, _ = build_window_scene(generator, window, previous_interval_uri, conf, f"{video_path}#{window_index}",
+                                            tracker, track_instances)
+        yield window_index, scene_graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate per-window scene graphs from a video")
+    parser.add_argument("video")
+    parser.add_argument("--output-dir", default="scene_graphs")
+    parser.add_argument("--ontology", default="ravdKGMerged1.owl")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--stride", type=int, default=5, help="Run detection on every n-th frame")
+    parser.add_argument("--window", type=int, default=10, help="Sampled frames per scene graph")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many sampled frames")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--log", help="Append each window as a named graph to this N-Quads log")
+    parser.add_argument("--no-tracking", action="store_true",
+                        help="Create new instances for every frame instead of following objects across frames")
+    parser.add_argument("--annotate-dir", help="Also write every sampled frame with its boxes drawn to this directory")
+    args = parser.parse_args()
+
+    scene_log = SceneLog(args.log) if args.log else None
+    if scene_log is None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    generator = SceneGraphGenerator(args.ontology, verbose=False)
+    engine = DetectionEngine(args.model, batch_size=args.batch_size)
+    video_stem = os.path.splitext(os.path.basename(args.video))[0]
+
+    write_annotated = None
+    if args.annotate_dir:
+        import cv2
+        from BoxRendering import draw_boxes
+        os.makedirs(args.annotate_dir, exist_ok=True)
+
+        def write_annotated(frame_index, detection):
+            # Frames are not reused after detection, so boxes are drawn onto them directly
+            destination = os.path.join(args.annotate_dir, f"{video_stem}_frame{frame_index:06d}.jpg")
+            cv2.imwrite(destination, draw_boxes(detection.image, detection.boxes, args.conf))
+
+    count = 0
+    start = time.perf_counter()
+    for window_index, scene_graph in iter_video_scene_graphs(generator, engine, args.video, args.stride,
+                                                             args.window, args.max_frames, args.conf,
+                                                             write_annotated, not args.no_tracking):
+        if scene_log is not None:
+            # Named after the window's Scene instance, as SceneQuery and the other log writers expect
+            scene_log.append(scene_graph, generator.current_scene.scene_instance_uri)
+        else:
+            destination = os.path.join(args.output_dir, f"{video_stem}_window{window_index:05d}.ttl")
+            scene_graph.serialize(destination=destination, format="turtle")
+        count += 1
+    print(f"Wrote {count} scene graphs in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
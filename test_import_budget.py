@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from Benchmarks import BUDGET_MODULES, IMPORT_BUDGET_MS, measure_import
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.mark.parametrize("module_name", BUDGET_MODULES)
+def test_import_budget(module_name, monkeypatch):
+    # measure_import runs a fresh interpreter that imports from the working directory
+    monkeypatch.chdir(REPO_DIR)
+    measurements = []
+    for _ in range(3):
+        measurement, error = measure_import(module_name)
+        if error is not None:
+            if "No module named 'PyQt5'" in error:
+                pytest.skip(f"{module_name} needs PyQt5: {error}")
+            pytest.fail(f"import {module_name} failed: {error}")
+        measurements.append(measurement)
+
+    assert not measurements[-1]["heavy"], f"{module_name} eagerly imports {', '.join(measurements[-1]['heavy'])}"
+    # The fastest of a few runs, so a busy machine does not fail the budget
+    milliseconds = min(m["seconds"] for m in measurements) * 1000
+    assert milliseconds <= IMPORT_BUDGET_MS, f"import {module_name} took {milliseconds:.0f} ms"
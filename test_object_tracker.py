@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from rdflib import RDF
+
+from ObjectTracker import ObjectTracker
+from SceneGraphGenerator import SceneGraphGenerator
+from SceneQuery import SceneIndex
+from VideoIngest import build_window_scene
+
+CAR, BICYCLE, PERSON = 2, 1, 0
+
+
+def frame_boxes(frame, with_person=True):
+    # A car driving right, and a cyclist riding left whose person box is left out when with_person is False
+    boxes = [[100 + 15 * frame, 100, 200 + 15 * frame, 180, 0.9, CAR],
+             [400 - 5 * frame, 120, 440 - 5 * frame, 200, 0.8, BICYCLE]]
+    if with_person:
+        boxes.append([402 - 5 * frame, 90, 438 - 5 * frame, 170, 0.85, PERSON])
+    return np.array(boxes, dtype=np.float32)
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return SceneGraphGenerator(verbose=False)
+
+
+def test_tracker_keeps_ids_of_moving_objects():
+    tracker = ObjectTracker()
+    first = tracker.update(frame_boxes(0)[:, :4], frame_boxes(0)[:, 5])
+    assert first.tolist() == [1, 2, 3]
+    for frame in range(1, 6):
+        boxes = frame_boxes(frame)
+        assert tracker.update(boxes[:, :4], boxes[:, 5]).tolist() == [1, 2, 3]
+
+
+def test_tracker_matches_by_center_when_boxes_stop_overlapping():
+    tracker = ObjectTracker()
+    tracker.update([[0, 0, 100, 100]], [CAR])
+    # Moved by 40% of the box diagonal: no IoU above the threshold, but close enough by center distance
+    assert tracker.update([[40, 40, 140, 140]], [CAR]).tolist() == [1]
+
+
+def test_tracker_separates_classes_and_new_objects():
+    tracker = ObjectTracker()
+    tracker.update([[0, 0, 100, 100]], [CAR])
+    ids = tracker.update([[0, 0, 100, 100], [500, 500, 600, 600]], [PERSON, CAR])
+    assert 1 not in ids.tolist()
+    assert len(set(ids.tolist())) == 2
+
+
+def test_tracker_drops_tracks_after_max_missed():
+    tracker = ObjectTracker(max_missed=2)
+    tracker.update([[0, 0, 100, 100]], [CAR])
+    for _ in range(2):
+        assert tracker.update(np.empty((0, 4)), []).tolist() == []
+    assert tracker.update([[0, 0, 100, 100]], [CAR]).tolist() == [1]
+    for _ in range(3):
+        tracker.update(np.empty((0, 4)), [])
+    assert len(tracker) == 0
+    assert tracker.update([[0, 0, 100, 100]], [CAR]).tolist() == [2]
+
+
+def test_tracked_objects_reuse_instances_and_sensors(generator):
+    # The person is missing in frame 5, so the cyclist is a Bicycle without a Rider there
+    window = [(frame, frame / 6, frame_boxes(frame, with_person=frame != 5)) for frame in range(10)]
+    scene_graph, _ = build_window_scene(generator, window, scene_id="tracked", tracker=ObjectTracker())
+    my_ns = generator.MY_NS
+
+    tracked = {name: uri for name, uri in generator.existing_instances.items() if name.startswith("Track")}
+    assert sorted(tracked) == ["Track1", "Track2", "Track3"]
+    assert len(list(scene_graph.subjects(RDF.type, my_ns["Car"]))) == 1
+    assert len(list(scene_graph.subjects(RDF.type, my_ns["Rider"]))) == 1
+    assert len(list(scene_graph.subjects(RDF.type, my_ns["VehicleSensor"]))) == 1
+    assert len(list(scene_graph.subjects(RDF.type, my_ns["BicycleSensor"]))) == 1
+    assert len(list(scene_graph.subjects(RDF.type, my_ns["SmartPhoneSensor"]))) == 1
+
+    # Spatial relations are never bare triples between tracked instances, only statements with a time
+    assert not list(scene_graph.triples((tracked["Track1"], my_ns["isLeftOf"], None)))
+    statements = list(scene_graph.subjects(RDF.type, RDF.Statement))
+    assert statements
+    assert all(scene_graph.value(statement, generator.TIME_NS["hasTime"]) is not None for statement in statements)
+
+    index = SceneIndex(generator.ancestors_of)
+    index.add_graph(scene_graph)
+    assert index.related("Car", "isLeftOf", "Bicycle") == [(tracked["Track1"], tracked["Track2"])]
+
+
+def test_person_getting_on_a_bicycle_stays_one_instance(generator):
+    # Walking beside the bicycle first, then riding it
+    window = []
+    for frame in range(6):
+        boxes = frame_boxes(frame)
+        if frame < 3:
+            boxes[2, [0, 2]] -= 60
+        window.append((frame, frame / 6, boxes))
+    scene_graph, _ = build_window_scene(generator, window, scene_id="boarding", tracker=ObjectTracker(max_center_distance=1.5))
+
+    person_uri = generator.existing_instances["Track3"]
+    classes = set(scene_graph.objects(person_uri, RDF.type))
+    assert {generator.MY_NS["Pedestrian"], generator.MY_NS["Rider"]} <= classes
+    assert not any(name.startswith("Track4") for name in generator.existing_instances)
+
+
+def test_tracked_objects_keep_their_instances_across_windows(generator):
+    tracker, track_instances = ObjectTracker(), {}
+    first_graph, interval_uri = build_window_scene(generator, [(frame, frame / 6, frame_boxes(frame)) for frame in range(5)],
+                                                   scene_id="window0", tracker=tracker, track_instances=track_instances)
+    first_tracked = {name: uri for name, uri in generator.existing_instances.items() if name.startswith("Track")}
+    second_graph, _ = build_window_scene(generator, [(frame, frame / 6, frame_boxes(frame)) for frame in range(5, 10)],
+                                         interval_uri, scene_id="window1", tracker=tracker, track_instances=track_instances)
+    second_tracked = {name: uri for name, uri in generator.existing_instances.items() if name.startswith("Track")}
+    my_ns = generator.MY_NS
+
+    assert second_tracked == first_tracked
+    assert len(list(first_graph.subjects(RDF.type, my_ns["VehicleSensor"]))) == 1
+    # The second window only observes the instances declared by the first one
+    assert not list(second_graph.subjects(RDF.type, my_ns["Car"]))
+    assert not list(second_graph.subjects(RDF.type, my_ns["VehicleSensor"]))
+    second_scene = next(second_graph.subjects(RDF.type, my_ns["Scene"]))
+    assert (second_scene, my_ns["includes"], first_tracked["Track1"]) in second_graph